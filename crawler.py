@@ -8,93 +8,655 @@
 import sys
 import os
 import time
+import asyncio
+import collections
 import hashlib
+import heapq
+import logging
+import logging.handlers
+import multiprocessing
+import sqlite3
+import threading
+import zlib
 import yaml
 import urllib.parse
 import urllib.robotparser
-from datetime import datetime, timedelta
-from typing import List, Dict, Set, Optional
 import re
+import email.utils
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import List, Dict, Set, Optional, Tuple
 
 try:
-    import requests
-    from bs4 import BeautifulSoup
-    from pymongo import MongoClient
-    from pymongo.errors import ConnectionFailure, DuplicateKeyError
+    import aiohttp
+    from lxml import html as lxml_html
+    from bson import Binary
+    from pymongo import MongoClient, UpdateOne
+    from pymongo.errors import BulkWriteError, ConnectionFailure
 except ImportError as e:
     print(f"Ошибка импорта: {e}")
     print("Установите необходимые зависимости: pip install -r requirements.txt")
     sys.exit(1)
 
+try:
+    from pybloom_live import ScalableBloomFilter
+except ImportError:
+    ScalableBloomFilter = None
+
+# Быстрое 64-битное хеширование URL (без него используется blake2b)
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Быстрый разбор HTML для извлечения ссылок: lexbor, а в версиях selectolax
+# без него - Modest (API одинаковый); без selectolax используется lxml
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+# Определение кодировки страниц без charset в Content-Type и <meta>
+try:
+    from charset_normalizer import from_bytes as detect_charset
+except ImportError:
+    detect_charset = None
+
+# Сжатие HTML в базе алгоритмом zstd (html_compression: zstd)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# aiohttp распаковывает brotli (br) только при установленном brotli/brotlicffi
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+from url_filter import (
+    URLCrawler,
+    cached_split,
+    is_wikipedia_article_url,
+    is_wikipedia_disallowed_path,
+)
+
+logger = logging.getLogger('crawler')
+
+
+def setup_logging(log_config: Optional[Dict] = None) -> logging.handlers.QueueListener:
+    """
+    Настраивает логгер робота: сообщения складываются в очередь, а выводом
+    на консоль и в файл занимается отдельный поток QueueListener.
+    
+    Args:
+        log_config: Секция logging конфигурации (level, file, max_bytes, backup_count)
+        
+    Returns:
+        Запущенный QueueListener (остановить его - stop() - в конце работы)
+    """
+    log_config = log_config or {}
+    formatter = logging.Formatter(log_config.get('format', '%(message)s'))
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_config.get('file'):
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_config['file'],
+            maxBytes=log_config.get('max_bytes', 10 * 1024 * 1024),
+            backupCount=log_config.get('backup_count', 5),
+            encoding='utf-8',
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Очередь межпроцессная: в нее пишут и процессы разбора HTML
+    log_queue = multiprocessing.Queue()
+    _attach_log_queue(log_queue, log_config.get('level', 'INFO'),
+                      log_config.get('max_tracebacks_per_minute', 10))
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return listener
+
+
+def _attach_log_queue(log_queue, level, max_tracebacks_per_minute: int = 10) -> None:
+    """Направляет сообщения логгера робота в очередь (также инициализатор процессов разбора)."""
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.filters = [TracebackThrottle(max_tracebacks_per_minute)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+class TracebackThrottle(logging.Filter):
+    """
+    Ограничивает число трассировок стека в логе: при серии однотипных ошибок
+    (например, во время сбоев сети) сверх лимита за минуту пишется только
+    строка сообщения. Критические ошибки выводятся с трассировкой всегда.
+    """
+    
+    def __init__(self, max_per_minute: int = 10):
+        super().__init__()
+        self.max_per_minute = max_per_minute
+        self._window_start = 0.0
+        self._count = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not record.exc_info or record.levelno >= logging.CRITICAL:
+            return True
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._count = 0
+        self._count += 1
+        if self._count > self.max_per_minute:
+            record.exc_info = None
+            record.exc_text = None
+        return True
+
+
+_META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
+
+def _resolve_charset(response, body: bytes) -> str:
+    """
+    Определяет кодировку ответа без charset в Content-Type (fallback_charset_resolver
+    сессии aiohttp, которая иначе считает такие страницы UTF-8).
+    
+    Сначала ищется <meta charset> в начале документа, затем кодировка
+    угадывается по содержимому (charset_normalizer), как apparent_encoding в requests.
+    """
+    match = _META_CHARSET_RE.search(body, 0, 4096)
+    if match:
+        return match.group(1).decode('ascii')
+    if detect_charset is not None:
+        best = detect_charset(body[:65536]).best()
+        if best is not None:
+            return best.encoding
+    return 'utf-8'
+
+
+def _decode_html(raw_bytes: bytes, encoding: str) -> Tuple[str, str]:
+    """Декодирует тело ответа; возвращает (HTML, фактически использованная кодировка)."""
+    try:
+        return raw_bytes.decode(encoding, errors='replace'), encoding
+    except LookupError:
+        return raw_bytes.decode('utf-8', errors='replace'), 'utf-8'
+
+
+def _digest64(text: str) -> int:
+    """Возвращает 64-битный отпечаток строки (URL хранятся в памяти в таком виде)."""
+    data = text.encode('utf-8', errors='surrogatepass')
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+# Разметка, скрипты и стили, которые не входят в текст страницы
+_HTML_MARKUP_RE = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->|<[^>]+>',
+                             re.IGNORECASE | re.DOTALL)
+# Слова из букв: числа и даты в отпечаток не попадают
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+
+def _simhash(html: str) -> int:
+    """
+    Вычисляет 64-битный simhash текста страницы.
+    
+    У страниц, отличающихся лишь небольшой частью текста (например, боковой
+    панелью), отпечатки отличаются в нескольких битах.
+    
+    Args:
+        html: HTML содержимое страницы
+        
+    Returns:
+        Отпечаток (0 для страницы без текста)
+    """
+    text = _HTML_MARKUP_RE.sub(' ', html).lower()
+    weights = [0] * 64
+    for word, count in collections.Counter(_WORD_RE.findall(text)).items():
+        h = _digest64(word)
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+# Результат _fetch_page для ответа 304 Not Modified
+NOT_MODIFIED = object()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает заголовок Retry-After (число секунд или HTTP-дата).
+    
+    Returns:
+        Задержка в секундах или None, если заголовок отсутствует или некорректен
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _content_hash(raw_bytes: bytes) -> str:
+    """
+    Вычисляет хеш содержимого документа для проверки изменений.
+    
+    Хешируются исходные байты ответа, без повторного кодирования HTML.
+    
+    Args:
+        raw_bytes: Тело HTTP ответа
+        
+    Returns:
+        SHA256 хеш содержимого
+    """
+    h = hashlib.sha256()
+    h.update(raw_bytes)
+    return h.hexdigest()
+
+
+def _extract_links_lxml(html: str, base_url: str, strict: bool) -> List[str]:
+    """Извлекает ссылки из HTML с помощью lxml."""
+    links = []
+    try:
+        try:
+            doc = lxml_html.fromstring(html)
+        except ValueError:
+            # lxml не принимает str с XML-объявлением кодировки
+            doc = lxml_html.fromstring(html.encode('utf-8'))
+    except lxml_html.etree.ParserError:
+        return links  # Пустой документ: ссылок нет
+    try:
+        # Разрешаем относительные ссылки (с учетом <base href>) прямо в дереве.
+        # make_links_absolute не передает handle_failures в resolve_base_href,
+        # поэтому <base href> разрешается отдельно: иначе одна некорректная
+        # ссылка обрывает разбор всей страницы
+        doc.resolve_base_href(handle_failures='ignore')
+        doc.make_links_absolute(base_url, resolve_base_href=False, handle_failures='ignore')
+        for element, attribute, href, _ in doc.iterlinks():
+            if element.tag != 'a' or attribute != 'href':
+                continue
+            
+            try:
+                classified = URLCrawler.classify_link(href, strict=strict)
+            except ValueError:
+                continue  # Некорректный URL
+            if classified is None:
+                continue  # Файлы, категории, служебные страницы и невалидные URL
+            
+            links.append(classified[0])
+    except Exception as e:
+        logger.error("Ошибка при извлечении ссылок: %s", e)
+    
+    return links
+
+
+def _extract_links_selectolax(html: str, base_url: str, strict: bool) -> List[str]:
+    """Извлекает ссылки из HTML с помощью selectolax."""
+    links = []
+    try:
+        tree = SelectolaxParser(html)
+        # Учитываем <base href>, как make_links_absolute в lxml
+        base = tree.css_first('base[href]')
+        if base is not None and base.attributes.get('href'):
+            base_url = urllib.parse.urljoin(base_url, base.attributes['href'].strip())
+        for node in tree.css('a[href]'):
+            href = node.attributes.get('href')
+            if href is None:
+                continue
+            try:
+                # Пустая ссылка указывает на саму страницу
+                url = urllib.parse.urljoin(base_url, href.strip())
+                classified = URLCrawler.classify_link(url, strict=strict)
+            except ValueError:
+                continue  # Некорректный URL
+            if classified is None:
+                continue  # Файлы, категории, служебные страницы и невалидные URL
+            
+            links.append(classified[0])
+    except Exception as e:
+        logger.error("Ошибка при извлечении ссылок: %s", e)
+    
+    return links
+
+
+def extract_links(html: str, base_url: str, strict: bool = False) -> List[str]:
+    """
+    Извлекает ссылки из HTML.
+    
+    Args:
+        html: HTML содержимое страницы
+        base_url: Базовый URL для разрешения относительных ссылок
+        strict: Перекодировать параметры запроса через parse_qs/urlencode
+        
+    Returns:
+        Список нормализованных URL
+    """
+    if not html:
+        return []
+    if SelectolaxParser is not None:
+        return _extract_links_selectolax(html, base_url, strict)
+    return _extract_links_lxml(html, base_url, strict)
+
+
+def _parse_worker(raw_bytes: bytes, encoding: str, base_url: Optional[str],
+                  strict: bool, with_simhash: bool = False) -> Tuple[str, List[str], Optional[int]]:
+    """
+    Разбирает загруженную страницу (выполняется в пуле процессов).
+    
+    Передаются исходные байты, а не str: их дешевле сериализовать.
+    
+    Args:
+        raw_bytes: Тело HTTP ответа
+        encoding: Кодировка страницы
+        base_url: URL страницы (None - ссылки не извлекаются)
+        strict: Перекодировать параметры запроса через parse_qs/urlencode
+        with_simhash: Вычислять ли simhash текста
+        
+    Returns:
+        (хеш содержимого, список нормализованных ссылок, simhash или None;
+        None и для страницы без текста - ее не с чем сравнивать)
+    """
+    links = []
+    fingerprint = None
+    if base_url is not None or with_simhash:
+        html, _ = _decode_html(raw_bytes, encoding)
+        if base_url is not None:
+            links = extract_links(html, base_url, strict)
+        if with_simhash:
+            # Нулевой отпечаток у всех страниц без текста (заглушки редиректов,
+            # страницы из одних картинок): считать их дубликатами друг друга нельзя
+            fingerprint = _simhash(html) or None
+    return _content_hash(raw_bytes), links, fingerprint
+
+
+def _stored_html(content, compression: Optional[str]) -> str:
+    """Возвращает HTML документа из базы, распаковывая его при необходимости."""
+    if not content:
+        return ''
+    if compression == 'zlib':
+        return zlib.decompress(content).decode('utf-8', errors='replace')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для чтения документов, сжатых zstd, установите zstandard")
+        return zstandard.ZstdDecompressor().decompress(content).decode('utf-8', errors='replace')
+    return content
+
+
+def _saved_docs_worker(docs: List[Tuple[str, object, Optional[str]]],
+                       strict: bool) -> List[Tuple[str, List[str]]]:
+    """
+    Извлекает ссылки из пакета сохраненных документов (выполняется в пуле процессов).
+    
+    Args:
+        docs: Список (url, html_content, compression) документов из базы
+        strict: Перекодировать параметры запроса через parse_qs/urlencode
+        
+    Returns:
+        Список (url документа, ссылки того же домена, не запрещенные для обкачки)
+    """
+    results = []
+    for url, content, compression in docs:
+        try:
+            html = _stored_html(content, compression)
+            if not html:
+                continue
+            domain = URLCrawler.get_domain(url)
+            links = [
+                link for link in extract_links(html, url, strict)
+                if URLCrawler.get_domain(link) == domain
+                and not is_wikipedia_disallowed_path(link, domain)
+            ]
+            results.append((url, links))
+        except Exception as e:
+            logger.error("Ошибка при извлечении ссылок из %s: %s", url, e)
+    return results
+
 
-class URLCrawler:
-    """Класс для нормализации и обработки URL."""
+class RecentURLs:
+    """
+    Ограниченное множество недавно обработанных URL (вытесняются самые старые).
+    
+    Хранятся 64-битные отпечатки URL (см. _digest64), а не сами строки.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._urls = collections.OrderedDict()
+    
+    def add(self, url: str):
+        """Добавляет URL, вытесняя самый давний при переполнении."""
+        key = _digest64(url)
+        self._urls[key] = None
+        self._urls.move_to_end(key)
+        if len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+    
+    def __contains__(self, url: str) -> bool:
+        key = _digest64(url)
+        if key in self._urls:
+            self._urls.move_to_end(key)
+            return True
+        return False
+    
+    def __len__(self) -> int:
+        return len(self._urls)
+
+
+class DomainFrontier:
+    """
+    Очередь URL с планированием по доменам.
+    
+    Для каждого домена хранится своя FIFO-очередь, а домены упорядочены в куче
+    по времени, когда к ним снова можно обращаться. Выдается только URL домена,
+    чье время уже наступило; пока страница домена обкачивается, домен не
+    выдается повторно (см. release). Множество URL в очереди поддерживается
+    при добавлении и выдаче, поэтому проверка `url in frontier` - O(1).
+    """
+    
+    def __init__(self, max_pages_per_domain: int = 0):
+        """
+        Args:
+            max_pages_per_domain: Лимит выдаваемых URL на домен (0 - без лимита)
+        """
+        self.max_pages_per_domain = max_pages_per_domain
+        self._queues: Dict[str, collections.deque] = {}
+        self._heap: List[Tuple[float, str]] = []  # (время готовности, домен)
+        self._ready_at: Dict[str, float] = {}
+        self._active: Set[str] = set()  # Домены, чьи URL сейчас обкачиваются
+        self._dispatched: Dict[str, int] = collections.Counter()
+        self._urls: Set[str] = set()  # URL, находящиеся в очереди
+    
+    def _schedule(self, domain: str):
+        """Ставит домен в кучу, если у него есть URL и он не обкачивается."""
+        if domain not in self._active and self._queues.get(domain):
+            heapq.heappush(self._heap, (self._ready_at.get(domain, 0.0), domain))
     
-    @staticmethod
-    def normalize_url(url: str, base_url: str = None) -> str:
+    def _budget_exhausted(self, domain: str) -> bool:
+        """Проверяет, выдано ли домену максимальное число URL."""
+        return 0 < self.max_pages_per_domain <= self._dispatched[domain]
+    
+    def append(self, item: Dict) -> bool:
         """
-        Нормализует URL: удаляет фрагменты, сортирует параметры и т.д.
+        Добавляет URL в очередь его домена.
         
+        Returns:
+            False, если URL уже в очереди или бюджет домена исчерпан
+        """
+        url = item["url"]
+        if url in self._urls:
+            return False
+        domain = URLCrawler.get_domain(url)
+        if self._budget_exhausted(domain):
+            return False
+        queue = self._queues.get(domain)
+        if queue is None:
+            queue = self._queues[domain] = collections.deque()
+        queue.append(item)
+        self._urls.add(url)
+        if len(queue) == 1:
+            self._schedule(domain)
+        return True
+    
+    def pop_ready(self, now: float) -> Optional[Dict]:
+        """
+        Выдает следующий URL домена, к которому уже можно обращаться.
+    
         Args:
-            url: URL для нормализации
-            base_url: Базовый URL для разрешения относительных ссылок
-            
+            now: Текущее время (по тем же часам, что и release)
+    
         Returns:
-            Нормализованный URL
+            Элемент очереди или None, если ни один домен еще не готов
         """
-        if not url:
-            return ""
-        
-        # Разрешаем относительные URL
-        if base_url:
-            url = urllib.parse.urljoin(base_url, url)
-        
-        # Парсим URL
-        parsed = urllib.parse.urlparse(url)
-        
-        # Удаляем фрагмент (#)
-        parsed = parsed._replace(fragment='')
-        
-        # Нормализуем путь (убираем лишние слеши)
-        path = urllib.parse.unquote(parsed.path)
-        path = re.sub(r'/+', '/', path)
-        if path and path != '/' and path.endswith('/'):
-            path = path[:-1]
-        
-        # Сортируем параметры запроса для единообразия
-        query_params = urllib.parse.parse_qs(parsed.query, keep_blank_values=True)
-        sorted_params = sorted(query_params.items())
-        query = urllib.parse.urlencode(sorted_params, doseq=True)
-        
-        # Собираем URL обратно
-        normalized = urllib.parse.urlunparse((
-            parsed.scheme.lower(),
-            parsed.netloc.lower(),
-            path,
-            parsed.params,
-            query,
-            ''  # fragment уже удален
-        ))
+        while self._heap and self._heap[0][0] <= now:
+            _, domain = heapq.heappop(self._heap)
+            queue = self._queues.get(domain)
+            if not queue or domain in self._active:
+                continue
+            item = queue.popleft()
+            self._urls.discard(item["url"])
+            self._active.add(domain)
+            self._dispatched[domain] += 1
+            if self._budget_exhausted(domain):
+                # Бюджет домена исчерпан: оставшиеся URL больше не нужны
+                self._urls.difference_update(queued["url"] for queued in queue)
+                del self._queues[domain]
+            elif not queue:
+                del self._queues[domain]
+            return item
+        return None
+    
+    def next_ready_time(self) -> Optional[float]:
+        """Время, когда будет готов ближайший домен (None, если ждать нечего)."""
+        return self._heap[0][0] if self._heap else None
+    
+    def release(self, domain: str, ready_at: float):
+        """
+        Возвращает домен в расписание после обкачки его страницы.
+    
+        Args:
+            domain: Домен обработанного URL
+            ready_at: Время, раньше которого к домену обращаться нельзя
+        """
+        self._active.discard(domain)
+        self._ready_at[domain] = ready_at
+        self._schedule(domain)
+    
+    def __len__(self) -> int:
+        return len(self._urls)
+    
+    def __bool__(self) -> bool:
+        return bool(self._urls)
+    
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+
+class SimhashIndex:
+    """
+    Индекс simhash-отпечатков сохраненных страниц для поиска почти-дубликатов.
+    
+    Отпечаток делится на max_distance + 1 полос: у отпечатков, отличающихся
+    не более чем в max_distance битах, хотя бы одна полоса совпадает, поэтому
+    точное расстояние Хэмминга считается только для кандидатов из тех же полос.
+    """
+    
+    def __init__(self, max_distance: int = 3):
+        """
+        Args:
+            max_distance: Максимальное расстояние Хэмминга для почти-дубликатов
+        """
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = 64 // bands
+        # (сдвиг, маска) каждой полосы; последняя забирает оставшиеся биты
+        self._bands = [
+            (i * width, (1 << (width if i < bands - 1 else 64 - i * width)) - 1)
+            for i in range(bands)
+        ]
+        self._buckets: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in self._bands]
+    
+    def find_near(self, fingerprint: int, url: str) -> bool:
+        """Проверяет, есть ли в индексе близкий отпечаток другой страницы."""
+        url_key = _digest64(url)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for other, other_url in buckets.get(fingerprint >> shift & mask, ()):
+                if other_url != url_key and bin(fingerprint ^ other).count('1') <= self.max_distance:
+                    return True
+        return False
+    
+    def add(self, fingerprint: int, url: str):
+        """Добавляет отпечаток страницы в индекс."""
+        entry = (fingerprint, _digest64(url))
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault(fingerprint >> shift & mask, []).append(entry)
+
+
+class RobotsCache:
+    """Хранит загруженные robots.txt в SQLite, чтобы не запрашивать их при каждом запуске."""
+    
+    def __init__(self, path: str, ttl_seconds: float):
+        """
+        Открывает (или создает) базу кэша.
         
-        return normalized
+        Args:
+            path: Путь к файлу SQLite
+            ttl_seconds: Время жизни записи в секундах
+        """
+        self.ttl_seconds = ttl_seconds
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS robots ("
+            "domain TEXT PRIMARY KEY, body BLOB, fetched_at INTEGER, status INTEGER)"
+        )
+        self.conn.commit()
     
-    @staticmethod
-    def is_valid_url(url: str) -> bool:
-        """Проверяет, является ли URL валидным."""
-        try:
-            parsed = urllib.parse.urlparse(url)
-            return bool(parsed.scheme and parsed.netloc)
-        except:
-            return False
+    def get(self, domain: str) -> Optional[Tuple[bytes, int, int]]:
+        """Возвращает (body, fetched_at, status) для домена или None."""
+        row = self.conn.execute(
+            "SELECT body, fetched_at, status FROM robots WHERE domain = ?", (domain,)
+        ).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0] or b''), row[1], row[2]
     
-    @staticmethod
-    def get_domain(url: str) -> str:
-        """Извлекает домен из URL."""
-        try:
-            parsed = urllib.parse.urlparse(url)
-            return parsed.netloc.lower()
-        except:
-            return ""
+    def is_fresh(self, entry: Tuple[bytes, int, int]) -> bool:
+        """Проверяет, не истек ли TTL записи."""
+        return time.time() - entry[1] < self.ttl_seconds
+    
+    def put(self, domain: str, body: bytes, status: int):
+        """Сохраняет robots.txt домена."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO robots (domain, body, fetched_at, status) VALUES (?, ?, ?, ?)",
+            (domain, body, int(time.time()), status)
+        )
+        self.conn.commit()
+    
+    def close(self):
+        """Закрывает соединение с базой кэша."""
+        self.conn.close()
 
 
 class DocumentCrawler:
@@ -108,14 +670,57 @@ class DocumentCrawler:
             config_path: Путь к YAML конфигурационному файлу
         """
         self.config = self._load_config(config_path)
+        self._log_listener = setup_logging(self.config.get('logging'))
+        self.strict_normalize = self.config['logic'].get('strict_url_normalization', False)
+        # Заголовки не меняются между запросами: формируем их один раз
+        self.headers = self._get_headers()
         self.db_client = None
         self.db_collection = None
-        self.visited_urls: Set[str] = set()
-        self.url_queue: List[Dict] = []
-        self.session = requests.Session()
-        self.failed_urls: Set[str] = set()  # URL, которые не удалось загрузить
+        # Источник истины об обработанных URL - база (уникальный индекс url).
+        # В памяти: фильтр Блума (None, если pybloom_live не установлен) для
+        # отсечения заведомо новых URL и ограниченный список недавно обработанных
+        self.visited_bloom = self._new_visited_filter()
+        self.recent_visited = RecentURLs(self.config['logic'].get('recent_urls_cache_size', 200_000))
+        self.known_urls_count = 0
+        self.url_queue = DomainFrontier(self.config['logic'].get('max_pages_per_domain', 0))
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.failed_count = 0  # Число неудачных загрузок
         self.robots_parsers: Dict[str, urllib.robotparser.RobotFileParser] = {}
+        # Домены, чей robots.txt не загрузился: до этого времени (time.monotonic)
+        # обкачка идет без проверки, затем загрузка повторяется
+        self._robots_retry_at: Dict[str, float] = {}
+        self.robots_cache: Optional[RobotsCache] = None
         self.crawl_delays: Dict[str, float] = {}  # Задержки для каждого домена
+        # Вежливость по доменам: не более одного запроса к домену одновременно
+        self._domain_locks: Dict[str, asyncio.Semaphore] = {}
+        self._domain_next_ok_at: Dict[str, float] = {}
+        self._domain_backoff: Dict[str, float] = {}  # Множитель задержки после ответов 429
+        self._fetch_semaphore: Optional[asyncio.Semaphore] = None
+        self._parse_retry_lock: Optional[asyncio.Lock] = None  # Повторный разбор после сбоя пула
+        self._in_progress: Set[str] = set()  # URL, которые загружаются прямо сейчас
+        self._pending_docs: Dict[str, Dict] = {}  # Документы, ожидающие записи в базу
+        self._last_flush_at = time.monotonic()
+        self._parse_pool: Optional[ProcessPoolExecutor] = None  # Процессы для разбора HTML
+        self._parse_workers = 0
+        # Очередь и пул разбора при восстановлении очереди используются из
+        # нескольких потоков (по потоку на источник, см. _initialize_queue)
+        self._init_lock = threading.Lock()
+        self._restore_cancelled = threading.Event()  # Ctrl-C во время восстановления очереди
+        # Отпечатки сохраненных страниц для пропуска почти-дубликатов (выключено по умолчанию)
+        self.simhash_index: Optional[SimhashIndex] = None
+        if self.config['logic'].get('skip_near_duplicates', False):
+            self.simhash_index = SimhashIndex(self.config['logic'].get('near_duplicate_distance', 3))
+        self.html_compression = self.config['logic'].get('html_compression', 'none')
+        self._zstd_compressor = None
+        if self.html_compression == 'zstd':
+            if zstandard is not None:
+                self._zstd_compressor = zstandard.ZstdCompressor(
+                    level=self.config['logic'].get('zstd_level', 3))
+            else:
+                logger.warning("Предупреждение: zstandard не установлен, HTML будет сжиматься zlib")
+                self.html_compression = 'zlib'
+        self.pages_crawled = 0
+        self.pages_saved = 0
         
     def _load_config(self, config_path: str) -> Dict:
         """Загружает конфигурацию из YAML файла."""
@@ -154,48 +759,144 @@ class DocumentCrawler:
             self.db_collection.create_index("url", unique=True)
             self.db_collection.create_index("crawl_date")
             
-            print(f"Подключение к MongoDB успешно: {db_config['host']}:{db_config['port']}")
+            logger.info("Подключение к MongoDB успешно: %s:%s", db_config['host'], db_config['port'])
         except ConnectionFailure:
-            print("Ошибка: не удалось подключиться к MongoDB")
-            print("Убедитесь, что MongoDB запущен и доступен")
+            logger.error("Ошибка: не удалось подключиться к MongoDB")
+            logger.error("Убедитесь, что MongoDB запущен и доступен")
             sys.exit(1)
         except Exception as e:
-            print(f"Ошибка подключения к базе данных: {e}")
+            logger.error("Ошибка подключения к базе данных: %s", e)
             sys.exit(1)
     
+    def _new_visited_filter(self, expected_count: int = 0):
+        """
+        Создает фильтр Блума обработанных URL (None без pybloom_live).
+        
+        Ложные срабатывания не приводят к потере страниц: такие URL
+        дополнительно проверяются по базе (см. _filter_recheck_needed).
+        
+        Args:
+            expected_count: Ожидаемое число URL (например, документов в базе)
+        """
+        if ScalableBloomFilter is None:
+            return None
+        capacity = self.config['logic'].get('bloom_initial_capacity', 1_000_000)
+        return ScalableBloomFilter(
+            initial_capacity=max(expected_count * 2, capacity),
+            error_rate=self.config['logic'].get('bloom_error_rate', 0.001),
+            mode=ScalableBloomFilter.LARGE_SET_GROWTH
+        )
+    
     def _load_visited_urls(self):
         """Загружает список уже обработанных URL из базы данных."""
         try:
-            cursor = self.db_collection.find({}, {"url": 1})
-            self.visited_urls = {doc["url"] for doc in cursor}
-            print(f"Загружено {len(self.visited_urls)} уже обработанных URL")
+            self.known_urls_count = self.db_collection.estimated_document_count()
+            self.visited_bloom = self._new_visited_filter(self.known_urls_count)
+            if self.visited_bloom is None:
+                # Без фильтра Блума каждый URL проверяется по базе
+                logger.info("В базе %s уже обработанных URL", self.known_urls_count)
+                return
+            # Покрывающий запрос по индексу url_1: документы целиком не читаются
+            cursor = self.db_collection.find({}, {"url": 1, "_id": 0}).hint("url_1").batch_size(10000)
+            for doc in cursor:
+                self.visited_bloom.add(doc["url"])
+            self.known_urls_count = len(self.visited_bloom)
+            logger.info("Загружено %s уже обработанных URL", self.known_urls_count)
         except Exception as e:
-            print(f"Предупреждение: не удалось загрузить список обработанных URL: {e}")
-            self.visited_urls = set()
+            logger.warning("Предупреждение: не удалось загрузить список обработанных URL: %s", e)
+            self.visited_bloom = self._new_visited_filter()
+    
+    def _mark_visited(self, url: str):
+        """Отмечает URL как обработанный в текущем запуске."""
+        self.recent_visited.add(url)
+        if self.visited_bloom is not None:
+            self.visited_bloom.add(url)
+    
+    def _maybe_visited(self, url: str) -> bool:
+        """
+        Проверяет, может ли URL уже быть в базе.
+        
+        False означает, что URL точно новый; True требует проверки по базе
+        (ложные срабатывания фильтра Блума разрешаются в _filter_recheck_needed).
+        """
+        return self.visited_bloom is None or url in self.visited_bloom
     
-    def _should_recheck(self, url: str) -> bool:
+    def _should_recheck(self, url: str) -> Tuple[bool, Optional[Dict[str, str]]]:
         """
         Определяет, нужно ли переобкачивать документ.
         
+        Тем же запросом читаются ETag и Last-Modified сохраненной версии,
+        чтобы переобкачка была условным запросом.
+        
         Args:
             url: URL документа
             
         Returns:
-            True, если документ нужно переобкачать
+            (True, если документ нужно переобкачать; валидаторы сохраненной версии или None)
         """
+        if url in self._pending_docs:
+            return False, None
         try:
-            doc = self.db_collection.find_one({"url": url})
-            if not doc:
-                return True
-            
-            crawl_date = doc.get("crawl_date", 0)
-            recheck_interval = self.config['logic'].get('recheck_interval_days', 7)
-            recheck_seconds = recheck_interval * 24 * 60 * 60
+            doc = self.db_collection.find_one(
+                {"url": url},
+                {"crawl_date": 1, "etag": 1, "last_modified": 1, "_id": 0}
+            )
+        except Exception as e:
+            logger.error("Ошибка при проверке необходимости переобкачки: %s", e)
+            return True, None
+        if doc is None:
+            return True, None
+        if doc.get("crawl_date", 0) >= self._recheck_threshold():
+            return False, None
+        validators = {field: doc[field] for field in ("etag", "last_modified") if doc.get(field)}
+        return True, validators or None
+    
+    def _recheck_threshold(self) -> float:
+        """Время, раньше которого обкачанные документы нужно переобкачать."""
+        recheck_interval = self.config['logic'].get('recheck_interval_days', 7)
+        return time.time() - recheck_interval * 24 * 60 * 60
+    
+    def _filter_recheck_needed(self, urls: List[str]) -> List[str]:
+        """
+        Отбирает URL, которые нужно (пере)обкачать, пакетными запросами к базе.
+        
+        Вместо find_one на каждый URL выполняется один запрос с $in по индексу
+        url на каждые 1000 URL.
+        
+        Args:
+            urls: Список URL документов
             
-            return (time.time() - crawl_date) > recheck_seconds
+        Returns:
+            URL, которых нет в базе или которые обкачаны раньше интервала переобкачки
+        """
+        # Документы, которые только что обкачаны и еще ждут записи в базу
+        urls = [url for url in urls if url not in self._pending_docs]
+        if not urls:
+            return []
+        
+        threshold = self._recheck_threshold()
+        
+        crawl_dates = {}
+        try:
+            for i in range(0, len(urls), 1000):
+                cursor = self.db_collection.find(
+                    {"url": {"$in": urls[i:i + 1000]}},
+                    {"url": 1, "crawl_date": 1, "_id": 0}
+                )
+                for doc in cursor:
+                    crawl_dates[doc["url"]] = doc.get("crawl_date", 0)
         except Exception as e:
-            print(f"Ошибка при проверке необходимости переобкачки: {e}")
-            return True
+            logger.error("Ошибка при проверке необходимости переобкачки: %s", e)
+            return urls
+        
+        return [url for url in urls if crawl_dates.get(url, 0) < threshold]
+    
+    def _touch_document(self, url: str):
+        """Обновляет дату обкачки неизменившегося документа."""
+        try:
+            self.db_collection.update_one({"url": url}, {"$set": {"crawl_date": int(time.time())}})
+        except Exception as e:
+            logger.error("Ошибка при обновлении даты обкачки %s: %s", url, e)
     
     def _get_user_agent(self) -> str:
         """Возвращает User-Agent для запросов."""
@@ -209,14 +910,35 @@ class DocumentCrawler:
             'User-Agent': user_agent,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate',
+            'Accept-Encoding': 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate',
             'Connection': 'keep-alive'
         }
     
-    def _get_robots_parser(self, url: str) -> Optional[urllib.robotparser.RobotFileParser]:
+    def _apply_crawl_delay(self, domain: str, rp: urllib.robotparser.RobotFileParser):
+        """Извлекает crawl-delay из robots.txt домена."""
+        MIN_DELAY = 5.0  # Минимальная задержка в секундах
+        user_agent = self._get_user_agent()
+        try:
+            # Пробуем получить crawl-delay для нашего User-Agent
+            crawl_delay = rp.crawl_delay(user_agent)
+            if crawl_delay is not None:
+                # Гарантируем минимум 5 секунд
+                delay_value = max(float(crawl_delay), MIN_DELAY)
+                self.crawl_delays[domain] = delay_value
+                logger.info("[robots.txt] Для домена %s установлен crawl-delay: %s сек (минимум %s сек)", domain, delay_value, MIN_DELAY)
+            else:
+                logger.info("[robots.txt] Crawl-delay не указан для %s, используется значение по умолчанию: %s сек", domain, MIN_DELAY)
+        except Exception as e:
+            # Если crawl-delay не указан, используем значение по умолчанию
+            logger.warning("[robots.txt] Не удалось получить crawl-delay для %s: %s", domain, e)
+    
+    async def _get_robots_parser(self, url: str) -> Optional[urllib.robotparser.RobotFileParser]:
         """
         Получает или создает парсер robots.txt для домена.
         
+        Сначала используется запись из RobotsCache; по сети robots.txt
+        загружается, только если записи нет или истек ее TTL.
+        
         Args:
             url: URL для определения домена
             
@@ -227,43 +949,68 @@ class DocumentCrawler:
         if not domain:
             return None
         
-        if domain not in self.robots_parsers:
-            try:
-                parsed_url = urllib.parse.urlparse(url)
-                robots_url = f"{parsed_url.scheme}://{domain}/robots.txt"
-                print(f"[robots.txt] Загрузка robots.txt для {domain}: {robots_url}")
-                rp = urllib.robotparser.RobotFileParser()
-                rp.set_url(robots_url)
-                rp.read()
-                self.robots_parsers[domain] = rp
-                print(f"[robots.txt] robots.txt успешно загружен для {domain}")
-                
-                # Извлекаем crawl-delay
-                MIN_DELAY = 5.0  # Минимальная задержка в секундах
-                user_agent = self._get_user_agent()
+        if domain in self.robots_parsers:
+            return self.robots_parsers[domain]
+        if time.monotonic() < self._robots_retry_at.get(domain, 0.0):
+            return None
+        
+        # Не загружаем robots.txt одного домена несколько раз параллельно
+        async with self._get_domain_lock(domain):
+            if domain in self.robots_parsers:
+                return self.robots_parsers[domain]
+            if time.monotonic() < self._robots_retry_at.get(domain, 0.0):
+                return None
+            
+            robots_url = f"{cached_split(url).scheme}://{domain}/robots.txt"
+            cached = self.robots_cache.get(domain) if self.robots_cache else None
+            if cached and self.robots_cache.is_fresh(cached):
+                body, _, status = cached
+                logger.info("[robots.txt] robots.txt для %s взят из кэша", domain)
+            else:
+                logger.info("[robots.txt] Загрузка robots.txt для %s: %s", domain, robots_url)
                 try:
-                    # Пробуем получить crawl-delay для нашего User-Agent
-                    crawl_delay = rp.crawl_delay(user_agent)
-                    if crawl_delay is not None:
-                        # Гарантируем минимум 5 секунд
-                        delay_value = max(float(crawl_delay), MIN_DELAY)
-                        self.crawl_delays[domain] = delay_value
-                        print(f"[robots.txt] Для домена {domain} установлен crawl-delay: {delay_value} сек (минимум {MIN_DELAY} сек)")
-                    else:
-                        print(f"[robots.txt] Crawl-delay не указан для {domain}, используется значение по умолчанию: {MIN_DELAY} сек")
+                    timeout = aiohttp.ClientTimeout(total=10)
+                    async with self.session.get(robots_url, timeout=timeout) as response:
+                        if response.status >= 500:
+                            # Временную ошибку сервера не кэшируем
+                            response.raise_for_status()
+                        status = response.status
+                        body = await response.read()
+                    if self.robots_cache:
+                        self.robots_cache.put(domain, body, status)
                 except Exception as e:
-                    # Если crawl-delay не указан, используем значение по умолчанию
-                    print(f"[robots.txt] Не удалось получить crawl-delay для {domain}: {e}")
-                    
-            except Exception as e:
-                # Если не удалось прочитать robots.txt, разрешаем обкачку
-                print(f"[robots.txt] Не удалось загрузить robots.txt для {domain}: {e}")
-                print(f"[robots.txt] Продолжаем обкачку без проверки robots.txt")
-                self.robots_parsers[domain] = None
+                    logger.warning("[robots.txt] Не удалось загрузить robots.txt для %s: %s", domain, e)
+                    if cached:
+                        # Временный сбой: используем устаревшую копию из кэша
+                        body, _, status = cached
+                        logger.info("[robots.txt] Используется устаревшая копия robots.txt для %s", domain)
+                    else:
+                        # Если не удалось прочитать robots.txt, разрешаем обкачку,
+                        # но сбой может быть временным: загрузку позже повторим
+                        retry_minutes = self.config['logic'].get('robots_retry_minutes', 10)
+                        self._robots_retry_at[domain] = time.monotonic() + retry_minutes * 60
+                        logger.info("[robots.txt] Продолжаем обкачку без проверки robots.txt "
+                                    "(повторная загрузка через %s мин)", retry_minutes)
+                        return None
+            
+            rp = urllib.robotparser.RobotFileParser()
+            rp.set_url(robots_url)
+            if status in (401, 403):
+                rp.disallow_all = True
+            elif 400 <= status < 500:
+                rp.allow_all = True
+            else:
+                rp.parse(body.decode('utf-8', errors='ignore').splitlines())
+            self.robots_parsers[domain] = rp
+            self._robots_retry_at.pop(domain, None)
+            logger.info("[robots.txt] robots.txt успешно загружен для %s", domain)
+            
+            # Извлекаем crawl-delay
+            self._apply_crawl_delay(domain, rp)
         
         return self.robots_parsers.get(domain)
     
-    def _can_fetch(self, url: str) -> bool:
+    async def _can_fetch(self, url: str) -> bool:
         """
         Проверяет, разрешена ли обкачка URL согласно robots.txt.
         
@@ -290,7 +1037,7 @@ class DocumentCrawler:
         if self._is_wikipedia_disallowed_path(url):
             return False
         
-        parser = self._get_robots_parser(url)
+        parser = await self._get_robots_parser(url)
         if parser is None:
             return True
         
@@ -312,8 +1059,8 @@ class DocumentCrawler:
                     if not hasattr(self, '_robots_warned_domains'):
                         self._robots_warned_domains = set()
                     self._robots_warned_domains.add(domain)
-                    print(f"  [robots.txt] Обкачка некоторых страниц запрещена для домена {domain}")
-                    print(f"  [robots.txt] Запрещенные страницы будут пропущены, обкачка продолжается")
+                    logger.info("  [robots.txt] Обкачка некоторых страниц запрещена для домена %s", domain)
+                    logger.info("  [robots.txt] Запрещенные страницы будут пропущены, обкачка продолжается")
         
         return can_fetch
     
@@ -331,27 +1078,43 @@ class DocumentCrawler:
         MIN_DELAY = 5.0  # Минимальная задержка в секундах
         
         domain = URLCrawler.get_domain(url)
+        # Домен, ответивший 429, временно обкачивается медленнее (см. _fetch_page)
+        backoff = self._domain_backoff.get(domain, 1.0)
         if domain in self.crawl_delays:
             delay = self.crawl_delays[domain]
-            return max(delay, MIN_DELAY)  # Гарантируем минимум
+            return max(delay, MIN_DELAY) * backoff  # Гарантируем минимум
         
         # Возвращаем значение по умолчанию из конфига, но не меньше минимума
         default_delay = self.config['logic'].get('delay_between_requests', MIN_DELAY)
-        return max(default_delay, MIN_DELAY)
+        return max(default_delay, MIN_DELAY) * backoff
+    
+    def _get_domain_lock(self, domain: str) -> asyncio.Semaphore:
+        """Возвращает семафор домена (один одновременный запрос на домен)."""
+        lock = self._domain_locks.get(domain)
+        if lock is None:
+            lock = asyncio.Semaphore(1)
+            self._domain_locks[domain] = lock
+        return lock
     
-    def _fetch_page(self, url: str, retry_count: int = 3) -> Optional[requests.Response]:
+    async def _fetch_page(self, url: str, retry_count: int = 3,
+                          validators: Optional[Dict[str, str]] = None):
         """
         Загружает страницу по URL с повторными попытками.
         
+        Запросы к одному домену выполняются строго последовательно с задержкой
+        crawl-delay между ними, запросы к разным доменам - параллельно.
+        
         Args:
             url: URL страницы
             retry_count: Количество попыток при ошибке
+            validators: ETag и Last-Modified сохраненной версии для условного запроса
             
         Returns:
-            Response объект или None при ошибке
+            (HTML страницы, исходные байты ответа, кодировка, валидаторы ответа),
+            NOT_MODIFIED, если страница не изменилась, или None при ошибке
         """
         # Проверяем robots.txt перед загрузкой
-        if not self._can_fetch(url):
+        if not await self._can_fetch(url):
             # Проверяем, является ли это запрещенной страницей Википедии
             domain = URLCrawler.get_domain(url)
             is_wiki_disallowed = self._is_wikipedia_disallowed_path(url)
@@ -367,472 +1130,339 @@ class DocumentCrawler:
                 
                 # Выводим сообщение только каждые 10 пропущенных страниц
                 if self._skipped_count[domain] % 10 == 1:
-                    print(f"[ПРОПУСК] Пропущено {self._skipped_count[domain]} страниц для {domain} (robots.txt). Продолжаем обкачку...")
+                    logger.info("[ПРОПУСК] Пропущено %s страниц для %s (robots.txt). Продолжаем обкачку...", self._skipped_count[domain], domain)
             
-            self.failed_urls.add(url)
+            self.failed_count += 1
             return None  # Пропускаем эту страницу, но продолжаем работу
         
-        # Обновляем заголовки для каждого запроса
-        self.session.headers.update(self._get_headers())
-        timeout = self.config['logic'].get('request_timeout', 30)
+        timeout = aiohttp.ClientTimeout(total=self.config['logic'].get('request_timeout', 30))
+        
+        # Условный запрос: сервер ответит 304 без тела, если страница не изменилась
+        request_headers = {}
+        if validators:
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+        domain = URLCrawler.get_domain(url)
+        domain_lock = self._get_domain_lock(domain)
+        loop = asyncio.get_running_loop()
+        
+        # Правильно кодируем URL, если он содержит кириллицу (один раз, до повторных попыток)
+        try:
+            # Проверяем, нужно ли кодировать URL
+            parsed = cached_split(url)
+            if not parsed.path.isascii():
+                # URL содержит не-ASCII символы, кодируем их
+                encoded_path = urllib.parse.quote(parsed.path, safe='/;')
+                url = urllib.parse.urlunsplit((
+                    parsed.scheme,
+                    parsed.netloc,
+                    encoded_path,
+                    parsed.query,
+                    parsed.fragment
+                ))
+        except:
+            pass
         
         for attempt in range(retry_count):
             try:
-                # Правильно кодируем URL, если он содержит кириллицу
-                try:
-                    # Проверяем, нужно ли кодировать URL
-                    parsed = urllib.parse.urlparse(url)
-                    if any(ord(c) > 127 for c in parsed.path):
-                        # URL содержит не-ASCII символы, кодируем их
-                        encoded_path = urllib.parse.quote(parsed.path, safe='/')
-                        url = urllib.parse.urlunparse((
-                            parsed.scheme,
-                            parsed.netloc,
-                            encoded_path,
-                            parsed.params,
-                            parsed.query,
-                            parsed.fragment
-                        ))
-                except:
-                    pass
-                
-                response = self.session.get(
-                    url, 
-                    timeout=timeout, 
-                    allow_redirects=True,
-                    stream=False
-                )
+                raw_bytes = None
+                async with domain_lock:
+                    # Ждем, пока истечет crawl-delay с момента предыдущего запроса к домену
+                    sleep_for = max(0.0, self._domain_next_ok_at.get(domain, 0.0) - loop.time())
+                    if sleep_for > 0:
+                        await asyncio.sleep(sleep_for)
+                    try:
+                        async with self.session.get(url, timeout=timeout, allow_redirects=True,
+                                                    headers=request_headers) as response:
+                            status = response.status
+                            reason = response.reason
+                            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                            if status == 200:
+                                raw_bytes = await response.read()
+                                encoding = response.get_encoding()
+                                response_validators = {
+                                    key: response.headers[header]
+                                    for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+                                    if response.headers.get(header)
+                                }
+                    finally:
+                        self._domain_next_ok_at[domain] = loop.time() + self._get_crawl_delay(url)
                 
                 # Проверяем статус код
-                if response.status_code == 200:
-                    response.encoding = response.apparent_encoding or 'utf-8'
-                    self.failed_urls.discard(url)  # Убираем из списка неудачных, если успешно
-                    return response
-                elif response.status_code == 429:
-                    # Too Many Requests - ждем дольше
-                    wait_time = (attempt + 1) * 5
-                    print(f"Получен код 429 (Too Many Requests) для {url}. Ожидание {wait_time} сек...")
-                    time.sleep(wait_time)
+                if status == 200:
+                    # Домен отвечает нормально: постепенно возвращаем обычную задержку
+                    if domain in self._domain_backoff:
+                        self._domain_backoff[domain] /= 2
+                        if self._domain_backoff[domain] <= 1.0:
+                            del self._domain_backoff[domain]
+                    html, encoding = _decode_html(raw_bytes, encoding)
+                    return html, raw_bytes, encoding, response_validators
+                elif status == 304 and validators:
+                    return NOT_MODIFIED
+                elif status == 429:
+                    # Too Many Requests - увеличиваем задержку для домена и ждем
+                    # столько, сколько просит сервер (Retry-After), но не меньше
+                    # обычного; время ожидания сдвигает готовность всего домена
+                    self._domain_backoff[domain] = min(self._domain_backoff.get(domain, 1.0) * 2, 16.0)
+                    wait_time = min(max(retry_after or 0.0, (attempt + 1) * 5), 600.0)
+                    self._domain_next_ok_at[domain] = max(
+                        self._domain_next_ok_at.get(domain, 0.0), loop.time() + wait_time
+                    )
+                    if attempt < retry_count - 1:
+                        logger.warning("Получен код 429 (Too Many Requests) для %s. Ожидание %.0f сек...",
+                                       url, wait_time)
+                    else:
+                        # Повтора не будет; задержка домена остается для других его URL
+                        logger.warning("Получен код 429 (Too Many Requests) для %s", url)
                     continue
-                elif response.status_code in [403, 404]:
+                elif status in [403, 404]:
                     # Доступ запрещен или страница не найдена
-                    print(f"Код {response.status_code} для {url}: {response.reason}")
-                    self.failed_urls.add(url)
+                    logger.warning("Код %s для %s: %s", status, url, reason)
+                    self.failed_count += 1
                     return None
                 else:
-                    response.raise_for_status()
+                    logger.warning("HTTP ошибка при загрузке %s (попытка %s/%s): %s %s", url, attempt + 1, retry_count, status, reason)
+                    if attempt < retry_count - 1 and status >= 500:
+                        # Повторяем только для серверных ошибок
+                        MIN_DELAY = 5.0
+                        wait_time = max(2 * (attempt + 1), MIN_DELAY)  # Минимум 5 секунд
+                        await asyncio.sleep(wait_time)
+                        continue
+                    else:
+                        self.failed_count += 1
+                        return None
                     
-            except requests.exceptions.Timeout:
-                print(f"Таймаут при загрузке {url} (попытка {attempt + 1}/{retry_count})")
+            except asyncio.TimeoutError:
+                logger.warning("Таймаут при загрузке %s (попытка %s/%s)", url, attempt + 1, retry_count)
                 if attempt < retry_count - 1:
                     MIN_DELAY = 5.0
                     wait_time = max(2 * (attempt + 1), MIN_DELAY)  # Минимум 5 секунд
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                     continue
                 else:
-                    self.failed_urls.add(url)
+                    self.failed_count += 1
                     return None
                     
-            except requests.exceptions.ConnectionError as e:
-                print(f"Ошибка соединения при загрузке {url} (попытка {attempt + 1}/{retry_count}): {e}")
+            except aiohttp.ClientConnectionError as e:
+                logger.warning("Ошибка соединения при загрузке %s (попытка %s/%s): %s", url, attempt + 1, retry_count, e)
                 if attempt < retry_count - 1:
                     MIN_DELAY = 5.0
                     wait_time = max(3 * (attempt + 1), MIN_DELAY)  # Минимум 5 секунд
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                     continue
                 else:
-                    self.failed_urls.add(url)
+                    self.failed_count += 1
                     return None
                     
-            except requests.exceptions.HTTPError as e:
-                print(f"HTTP ошибка при загрузке {url} (попытка {attempt + 1}/{retry_count}): {e}")
-                if attempt < retry_count - 1 and response.status_code >= 500:
-                    # Повторяем только для серверных ошибок
-                    MIN_DELAY = 5.0
-                    wait_time = max(2 * (attempt + 1), MIN_DELAY)  # Минимум 5 секунд
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    self.failed_urls.add(url)
-                    return None
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"Ошибка при загрузке {url} (попытка {attempt + 1}/{retry_count}): {e}")
+            except aiohttp.ClientError as e:
+                logger.warning("Ошибка при загрузке %s (попытка %s/%s): %s", url, attempt + 1, retry_count, e)
                 if attempt < retry_count - 1:
                     MIN_DELAY = 5.0
                     wait_time = max(2 * (attempt + 1), MIN_DELAY)  # Минимум 5 секунд
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
                     continue
                 else:
-                    self.failed_urls.add(url)
+                    self.failed_count += 1
                     return None
             except Exception as e:
-                print(f"Неожиданная ошибка при загрузке {url}: {e}")
-                self.failed_urls.add(url)
+                logger.error("Неожиданная ошибка при загрузке %s: %s", url, e)
+                self.failed_count += 1
                 return None
         
-        print(f"Не удалось загрузить {url} после {retry_count} попыток")
-        self.failed_urls.add(url)
+        logger.warning("Не удалось загрузить %s после %s попыток", url, retry_count)
+        self.failed_count += 1
         return None
     
-    def _extract_links(self, html: str, base_url: str) -> List[str]:
+    async def _parse_page(self, raw_bytes: bytes, encoding: str, base_url: str,
+                          with_links: bool = True) -> Optional[Tuple[str, List[str], Optional[int]]]:
         """
-        Извлекает ссылки из HTML.
+        Вычисляет хеш страницы, извлекает из нее ссылки и (если включен поиск
+        почти-дубликатов) simhash текста.
+        
+        Разбор HTML нагружает процессор, поэтому выполняется в пуле процессов
+        (если он создан), не блокируя загрузку других страниц.
         
         Args:
-            html: HTML содержимое страницы
-            base_url: Базовый URL для разрешения относительных ссылок
+            raw_bytes: Тело HTTP ответа
+            encoding: Кодировка страницы
+            base_url: URL страницы
+            with_links: Извлекать ли ссылки
             
         Returns:
-            Список нормализованных URL
+            (хеш содержимого, список нормализованных ссылок, simhash или None);
+            None, если страница дважды уронила процесс разбора
         """
-        links = []
+        with_simhash = self.simhash_index is not None
+        args = (raw_bytes, encoding, base_url if with_links else None, self.strict_normalize, with_simhash)
+        if self._parse_pool is None or not (with_links or with_simhash):
+            # Без разбора HTML остается только хеш: пересылка в процесс дороже
+            return _parse_worker(*args)
+        loop = asyncio.get_running_loop()
+        pool = self._parse_pool
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            for tag in soup.find_all('a', href=True):
-                href = tag['href']
-                normalized = URLCrawler.normalize_url(href, base_url)
-                
-                if not normalized or not URLCrawler.is_valid_url(normalized):
-                    continue
-                
-                # Исключаем файлы
-                if self._is_file_url(normalized):
-                    continue
-                
-                # Для Википедии проверяем, что это обычная статья (не категория, не служебная страница)
-                domain = URLCrawler.get_domain(normalized)
-                if 'wikipedia.org' in domain:
-                    if not self._is_wikipedia_article_url(normalized):
-                        continue  # Пропускаем категории, служебные страницы и файлы
-                
-                links.append(normalized)
-        except Exception as e:
-            print(f"Ошибка при извлечении ссылок: {e}")
-        
-        return links
+            return await loop.run_in_executor(pool, _parse_worker, *args)
+        except BrokenProcessPool:
+            # Рабочий процесс упал (например, из-за нехватки памяти на огромной
+            # странице): пересоздаем пул и повторяем разбор один раз. В основном
+            # процессе страницу не разбираем - она может уронить и его
+            self._restart_parse_pool(pool)
+        
+        # Повторы идут по одному: страница, снова уронившая процесс, не утянет
+        # за собой повторы других страниц, упавших вместе с ней
+        async with self._parse_retry_lock:
+            pool = self._parse_pool
+            try:
+                return await loop.run_in_executor(pool, _parse_worker, *args)
+            except BrokenProcessPool:
+                self._restart_parse_pool(pool)
+                return None
     
-    def _calculate_content_hash(self, html: str) -> str:
-        """
-        Вычисляет хеш содержимого документа для проверки изменений.
-        
-        Args:
-            html: HTML содержимое
-            
-        Returns:
-            SHA256 хеш содержимого
-        """
-        return hashlib.sha256(html.encode('utf-8')).hexdigest()
+    def _restart_parse_pool(self, pool: ProcessPoolExecutor):
+        """Пересоздает аварийно завершившийся пул процессов разбора HTML."""
+        with self._init_lock:
+            if self._parse_pool is not pool:
+                return  # Пул уже пересоздан другой задачей
+            logger.warning("Предупреждение: пул процессов разбора HTML завершился аварийно, создаем заново")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = self._new_parse_pool()
+    
+    def _new_parse_pool(self) -> ProcessPoolExecutor:
+        """Создает пул процессов разбора HTML, пишущих в общую очередь логов."""
+        return ProcessPoolExecutor(
+            max_workers=self._parse_workers,
+            initializer=_attach_log_queue,
+            initargs=(self._log_listener.queue, logger.level,
+                      (self.config.get('logging') or {}).get('max_tracebacks_per_minute', 10)),
+        )
     
-    def _save_document(self, url: str, html: str, source_name: str) -> bool:
+    async def _save_document(self, url: str, html: str, content_hash: str, source_name: str,
+                             validators: Optional[Dict[str, str]] = None) -> bool:
         """
-        Сохраняет документ в базу данных.
+        Добавляет документ в буфер записи в базу данных.
+        
+        Документы записываются пакетами через bulk_write (см. _write_documents)
+        в отдельном потоке, не блокируя цикл событий.
         
         Args:
             url: Нормализованный URL
             html: HTML содержимое документа
+            content_hash: Хеш исходных байтов ответа
             source_name: Название источника
+            validators: ETag и Last-Modified из ответа (для условных запросов)
             
         Returns:
-            True, если документ был сохранен или обновлен
+            True, если документ принят к сохранению
         """
         try:
-            content_hash = self._calculate_content_hash(html)
-            crawl_date = int(time.time())
-            
-            # Проверяем, существует ли документ
-            existing_doc = self.db_collection.find_one({"url": url})
+            document = {
+                "html_content": html,
+                "crawl_date": int(time.time()),
+                "content_hash": content_hash,
+                "source_name": source_name
+            }
+            if validators:
+                document.update(validators)
+            if self.html_compression == 'zlib':
+                document["html_content"] = Binary(zlib.compress(html.encode('utf-8'), 6))
+                document["compression"] = "zlib"
+            elif self.html_compression == 'zstd':
+                document["html_content"] = Binary(self._zstd_compressor.compress(html.encode('utf-8')))
+                document["compression"] = "zstd"
+            self._pending_docs[url] = document
             
-            if existing_doc:
-                # Если документ не изменился, обновляем только дату обкачки
-                if existing_doc.get("content_hash") == content_hash:
-                    self.db_collection.update_one(
-                        {"url": url},
-                        {"$set": {"crawl_date": crawl_date}}
-                    )
-                    print(f"Документ не изменился, обновлена дата: {url}")
-                else:
-                    # Документ изменился, обновляем его
-                    self.db_collection.update_one(
-                        {"url": url},
-                        {
-                            "$set": {
-                                "html_content": html,
-                                "crawl_date": crawl_date,
-                                "content_hash": content_hash,
-                                "source_name": source_name
-                            }
-                        }
-                    )
-                    print(f"Документ обновлен: {url}")
-            else:
-                # Новый документ
-                document = {
-                    "url": url,
-                    "html_content": html,
-                    "source_name": source_name,
-                    "crawl_date": crawl_date,
-                    "content_hash": content_hash
-                }
-                self.db_collection.insert_one(document)
-                print(f"Документ сохранен: {url}")
+            # Пакет записывается при наборе db_batch_size документов или спустя
+            # db_flush_interval секунд, чтобы при медленной обкачке документы
+            # не задерживались в памяти надолго
+            batch_size = self.config['logic'].get('db_batch_size', 100)
+            flush_interval = self.config['logic'].get('db_flush_interval', 2.0)
+            now = time.monotonic()
+            if len(self._pending_docs) >= batch_size or now - self._last_flush_at >= flush_interval:
+                self._last_flush_at = now
+                pending = self._pending_docs
+                self._pending_docs = {}
+                await asyncio.to_thread(self._write_documents, pending)
             
             return True
-        except DuplicateKeyError:
-            print(f"Предупреждение: дубликат URL (должен быть обработан): {url}")
-            return False
         except Exception as e:
-            print(f"Ошибка при сохранении документа {url}: {e}")
+            logger.error("Ошибка при сохранении документа %s: %s", url, e)
             return False
     
-    def _is_same_domain(self, url1: str, url2: str) -> bool:
-        """Проверяет, принадлежат ли URL одному домену."""
-        return URLCrawler.get_domain(url1) == URLCrawler.get_domain(url2)
+    def _flush_documents(self):
+        """Записывает в базу все документы, оставшиеся в буфере."""
+        if not self._pending_docs:
+            return
+        
+        pending = self._pending_docs
+        self._pending_docs = {}
+        self._write_documents(pending)
     
-    def _is_file_url(self, url: str) -> bool:
-        """
-        Проверяет, является ли URL файлом (изображением, медиа и т.д.).
-        
-        Args:
-            url: URL для проверки
-            
-        Returns:
-            True, если это файл
+    def _write_documents(self, pending: Dict[str, Dict]):
         """
-        # Расширения файлов для исключения
-        file_extensions = [
-            '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico',  # Изображения
-            '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',  # Документы
-            '.zip', '.rar', '.7z', '.tar', '.gz',  # Архивы
-            '.mp3', '.mp4', '.avi', '.mov', '.wmv', '.flv',  # Видео/Аудио
-            '.css', '.js', '.json', '.xml',  # Веб-файлы
-            '.ttf', '.woff', '.woff2', '.eot',  # Шрифты
-        ]
-        
-        url_lower = url.lower()
-        for ext in file_extensions:
-            if ext in url_lower or url_lower.endswith(ext):
-                return True
-        
-        # Проверяем пути к файлам в Википедии
-        if '/wiki/File:' in url or '/wiki/Файл:' in url or '/wiki/Media:' in url or '/wiki/Медиа:' in url:
-            return True
-        
-        # Проверяем прямые ссылки на файлы
-        if '/File:' in url or '/Файл:' in url:
-            return True
+        Записывает пакет документов в базу одним bulk_write.
         
-        return False
-    
-    def _is_wikipedia_article_url(self, url: str) -> bool:
-        """
-        Проверяет, является ли URL обычной статьей Википедии (не служебной страницей, не категорией, не файлом).
-        Согласно robots.txt Википедии, обычные статьи разрешены для обкачки.
+        Хеши уже сохраненных версий читаются одним запросом с $in: для
+        неизменившихся документов обновляется только дата обкачки.
         
         Args:
-            url: URL для проверки
-            
-        Returns:
-            True, если это обычная статья
+            pending: Документы по URL (буфер уже отцеплен от _pending_docs)
         """
-        domain = URLCrawler.get_domain(url)
-        if 'wikipedia.org' not in domain:
-            return False
-        
-        # Проверяем, что это не файл
-        if self._is_file_url(url):
-            return False
-        
-        # Проверяем, что это не запрещенный путь
-        if self._is_wikipedia_disallowed_path(url):
-            return False
-        
-        # Проверяем, что это обычная статья (начинается с /wiki/ и не содержит служебных префиксов)
         try:
-            decoded_url = urllib.parse.unquote(url)
-        except:
-            decoded_url = url
-        
-        # Разрешаем только обычные статьи
-        if '/wiki/' in url:
-            # Исключаем служебные страницы и категории
-            forbidden_prefixes = [
-                '/wiki/Википедия:',
-                '/wiki/Wikipedia:',
-                '/wiki/Участник:',
-                '/wiki/Участница:',
-                '/wiki/Обсуждение_участника:',
-                '/wiki/Обсуждение_участницы:',
-                '/wiki/Special:',
-                '/wiki/User:',
-                '/wiki/User_talk:',
-                '/wiki/File:',
-                '/wiki/Файл:',
-                '/wiki/Media:',
-                '/wiki/Медиа:',
-                '/wiki/Category:',
-                '/wiki/Категория:',
-                '/wiki/Category%3A',
-                '/wiki/Категория%3A',
-                '/wiki/%D0%9A%D0%B0%D1%82%D0%B5%D0%B3%D0%BE%D1%80%D0%B8%D1%8F:',
-                '/wiki/%D0%9A%D0%B0%D1%82%D0%B5%D0%B3%D0%BE%D1%80%D0%B8%D1%8F%3A',
-            ]
+            cursor = self.db_collection.find(
+                {"url": {"$in": list(pending)}},
+                {"url": 1, "content_hash": 1, "_id": 0}
+            )
+            existing_hashes = {doc["url"]: doc.get("content_hash") for doc in cursor}
             
-            for prefix in forbidden_prefixes:
-                if prefix in decoded_url or prefix in url:
-                    return False
+            ops = []
+            for url, document in pending.items():
+                if url in existing_hashes and existing_hashes[url] == document["content_hash"]:
+                    # Если документ не изменился, обновляем только дату обкачки
+                    # и валидаторы ответа (для следующего условного запроса)
+                    update = {"$set": {field: document[field]
+                                       for field in ("crawl_date", "etag", "last_modified")
+                                       if field in document}}
+                    unset = {field: "" for field in ("etag", "last_modified") if field not in document}
+                    if unset:
+                        update["$unset"] = unset
+                    ops.append(UpdateOne({"url": url}, update))
+                    logger.info("Документ не изменился, обновлена дата: %s", url)
+                else:
+                    # Новый или изменившийся документ
+                    update = {
+                        "$set": document,
+                        "$setOnInsert": {"first_seen": document["crawl_date"]}
+                    }
+                    # Ранее документ мог быть сохранен сжатым или с другими валидаторами
+                    unset = {field: "" for field in ("compression", "etag", "last_modified")
+                             if field not in document}
+                    if unset:
+                        update["$unset"] = unset
+                    ops.append(UpdateOne({"url": url}, update, upsert=True))
+                    if url in existing_hashes:
+                        logger.info("Документ обновлен: %s", url)
+                    else:
+                        logger.info("Документ сохранен: %s", url)
             
-            # Разрешаем только обычные статьи (не категории, не служебные страницы)
-            return True
-        
-        return False
+            self.db_collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            logger.warning("Предупреждение: %s из %s документов не записаны в базу", len(errors), len(pending))
+            for error in errors[:5]:
+                logger.info("  %s", error.get('errmsg'))
+        except Exception as e:
+            logger.error("Ошибка при записи %s документов в базу: %s", len(pending), e)
+    
+    def _is_wikipedia_article_url(self, url: str) -> bool:
+        """Проверяет, является ли URL обычной статьей Википедии."""
+        return is_wikipedia_article_url(url, URLCrawler.get_domain(url))
     
     def _is_wikipedia_disallowed_path(self, url: str) -> bool:
-        """
-        Проверяет, попадает ли URL под запрещенные пути для Википедии согласно robots.txt.
-        Это дополнительная проверка для русской Википедии.
-        
-        Args:
-            url: URL для проверки
-            
-        Returns:
-            True, если путь запрещен
-        """
-        domain = URLCrawler.get_domain(url)
-        if 'wikipedia.org' not in domain:
-            return False
-        
-        # Декодируем URL для проверки
-        try:
-            decoded_url = urllib.parse.unquote(url)
-        except:
-            decoded_url = url
-        
-        # Общие запрещенные пути для всех языковых версий
-        disallowed_patterns = [
-            '/w/',  # Но Allow: /w/api.php?action=mobileview&, /w/load.php?, /w/rest.php/site/v1/sitemap
-            '/api/',  # Но Allow: /api/rest_v1/?doc
-            '/trap/',
-            '/wiki/Special:',
-            '/wiki/Spezial:',
-            '/wiki/Spesial:',
-            '/wiki/Special%3A',
-            '/wiki/Spezial%3A',
-            '/wiki/Spesial%3A',
-        ]
-        
-        # Проверяем общие запрещенные пути (с исключениями)
-        for pattern in disallowed_patterns:
-            if pattern in url or pattern in decoded_url:
-                # Проверяем исключения для /w/
-                if pattern == '/w/':
-                    if '/w/api.php?action=mobileview&' in url or '/w/load.php?' in url or '/w/rest.php/site/v1/sitemap' in url:
-                        continue  # Разрешено
-                    return True
-                # Проверяем исключения для /api/
-                elif pattern == '/api/':
-                    if '/api/rest_v1/?doc' in url:
-                        continue  # Разрешено
-                    return True
-                return True
-        
-        # Специфичные запрещенные пути для ru.wikipedia.org
-        if 'ru.wikipedia.org' in domain:
-            ru_disallowed_patterns = [
-                '/wiki/Участник:',
-                '/wiki/Участник%3A',
-                '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA:',
-                '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%3A',
-                '/wiki/Участница:',
-                '/wiki/Участница%3A',
-                '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D0%B0:',
-                '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D0%B0%3A',
-                '/wiki/Обсуждение_участника:',
-                '/wiki/Обсуждение_участника%3A',
-                '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%D0%B0:',
-                '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%D0%B0%3A',
-                '/wiki/Обсуждение_участницы:',
-                '/wiki/Обсуждение_участницы%3A',
-                '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D1%8B:',
-                '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D1%8B%3A',
-                '/wiki/Википедия:Выборы_арбитров/',
-                '/wiki/Википедия%3AВыборы_арбитров%2F',
-                '/wiki/Википедия:К_удалению',
-                '/wiki/Википедия%3AК_удалению',
-                '/wiki/Википедия:К_восстановлению',
-                '/wiki/Википедия%3AК_восстановлению',
-                '/wiki/Википедия:Архив_запросов_на_удаление/',
-                '/wiki/Википедия%3AАрхив_запросов_на_удаление%2F',
-                '/wiki/Википедия:Проверка_участников',
-                '/wiki/Википедия%3AПроверка_участников',
-                '/wiki/Википедия:Запросы_к_администраторам',
-                '/wiki/Википедия%3AЗапросы_к_администраторам',
-                '/wiki/Википедия:Заявки_на_снятие_флагов',
-                '/wiki/Википедия%3AЗаявки_на_снятие_флагов',
-                '/wiki/Википедия:Запросы,_связанные_с_VRTS',
-                '/wiki/Википедия%3AЗапросы%2C_связанные_с_VRTS',
-                # Также проверяем варианты с URL-кодированием
-                '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BF%D0%B5%D0%B4%D0%B8%D1%8F:',
-                '/wiki/Википедия:Сообщить_об_ошибке',
-                '/wiki/Википедия:Как_править_статьи',
-                '/wiki/Википедия:Сообщество',
-                '/wiki/Википедия:Форум',
-                '/wiki/Википедия:Справка',
-                '/wiki/Служебная:RecentChanges',  # Свежие правки
-                '/wiki/Специальная:NewPages',  # Новые страницы
-                '/wiki/Служебная:SpecialPages',  # Служебные страницы
-                '/wiki/Служебная:WhatLinksHere',  # Ссылки сюда
-                '/wiki/Служебная:RecentChangesLinked',  # Связанные правки
-                '/wiki/Служебная:PermanentLink',  # Постоянная ссылка
-                '/wiki/Служебная:Info',  # Сведения о странице
-                '/wiki/Служебная:ShortUrl',  # Получить короткий URL
-                '/wiki/Специальная:QrCode',  # Скачать QR-код
-                '/wiki/Служебная:Print',  # Печать/экспорт
-                '/wiki/Специальная:DownloadAsPdf',  # Скачать как PDF
-                '/wiki/Специальная:PrintableVersion',  # Версия для печати
-                
-
-                '/wiki/Викиновости:',
-                '/wiki/Викицитатник:',
-                '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D1%86%D0%B8%D1%82%D0%B0%D1%82%D0%BD%D0%B8%D0%BA:',
-                '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BD%D0%BE%D0%B2%D0%BE%D1%81%D1%82%D0%B8:',
-        
-                # Викиданные
-                '/wiki/d:',
-                '/wiki/Q',
-                '/wiki/P',
-                
-                # Другие языки (примеры из списка)
-                '/wiki/%D0%90%D0%B7%C9%99%D1%80%D0%B1%D0%B0%D1%98%D1%81%D0%B0%D0%BD%D0%B4%D0%B6%D0%B0:',
-                '/wiki/%D0%91%D0%B0%D1%88%D2%A1%D0%BE%D1%80%D1%82%D1%81%D0%B0:',
-                '/wiki/%D0%91%D0%B5%D0%BB%D0%B0%D1%80%D1%83%D1%81%D0%BA%D0%B0%D1%8F:',
-                '/wiki/%D0%9D%D0%BE%D1%85%D1%87%D0%B8%D0%B9%D0%BD:',
-                '/wiki/%D0%A7%D3%90%D0%B2%D0%B0%D1%88%D0%BB%D0%B0:',
-                '/wiki/Hawai%CA%BBi:',
-                '/wiki/%D0%93%D0%B0%D0%B9%D0%B5%D1%80%D0%B5%D0%BD:',
-                '/wiki/%D0%9A%D1%8B%D1%80%D0%B3%D1%8B%D0%B7%D1%87%D0%B0:',
-                '/wiki/%D0%98%D1%80%D0%BE%D0%BD:',
-            ]
-            
-            for pattern in ru_disallowed_patterns:
-                if pattern in url or pattern in decoded_url:
-                    return True
-            
-            # Проверяем служебные страницы Википедии (начинающиеся с "Википедия:")
-            if '/wiki/Википедия:' in decoded_url or '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BF%D0%B5%D0%B4%D0%B8%D1%8F:' in url:
-                # Но разрешаем некоторые страницы категорий и списков
-                allowed_wiki_pages = [
-                    '/wiki/Категория:',
-                    '/wiki/Список:',
-                ]
-                for allowed in allowed_wiki_pages:
-                    if allowed in decoded_url:
-                        return False
-                return True
-        
-        return False
+        """Проверяет, попадает ли URL под запрещенные пути Википедии согласно robots.txt."""
+        return is_wikipedia_disallowed_path(url, URLCrawler.get_domain(url))
     
-    def _crawl_page(self, url: str, source_name: str, depth: int = 0):
+    async def _crawl_page(self, url: str, source_name: str, depth: int = 0) -> bool:
         """
         Обкачивает одну страницу.
         
@@ -840,75 +1470,135 @@ class DocumentCrawler:
             url: URL страницы
             source_name: Название источника
             depth: Текущая глубина обхода
+            
+        Returns:
+            True, если документ был сохранен
         """
+        saved = False
+        claimed_url = None
         try:
-            normalized_url = URLCrawler.normalize_url(url)
+            normalized_url = URLCrawler.normalize_url(url, strict=self.strict_normalize)
             
             # Проверяем, не превышена ли глубина
             max_depth = self.config['logic'].get('max_depth', 10)
             if depth > max_depth:
-                return
+                return saved
             
             # Проверяем, не обработан ли уже этот URL
-            if normalized_url in self.visited_urls:
-                if not self._should_recheck(normalized_url):
-                    return
+            if normalized_url in self.recent_visited:
+                return saved
+            validators = None
+            if self._maybe_visited(normalized_url):
+                # Переобкачка запрашивает страницу условно (по ETag/Last-Modified)
+                recheck, validators = await asyncio.to_thread(self._should_recheck, normalized_url)
+                if not recheck:
+                    return saved
+            
+            # Страница уже загружается другой задачей
+            if normalized_url in self._in_progress:
+                return saved
+            self._in_progress.add(normalized_url)
+            claimed_url = normalized_url
             
-            print(f"[Глубина {depth}] Обкачка: {normalized_url}")
+            logger.info("[Глубина %s] Обкачка: %s", depth, normalized_url)
             
             # Загружаем страницу
-            response = self._fetch_page(normalized_url)
-            if not response:
-                print(f"Не удалось загрузить страницу: {normalized_url}. Продолжаем работу...")
+            page = await self._fetch_page(normalized_url, validators=validators)
+            if page is None:
+                logger.warning("Не удалось загрузить страницу: %s. Продолжаем работу...", normalized_url)
                 # Помечаем как посещенный, чтобы не пытаться снова сразу
-                self.visited_urls.add(normalized_url)
-                return
+                self._mark_visited(normalized_url)
+                return saved
+            if page is NOT_MODIFIED:
+                # Страница не изменилась: обновляем только дату обкачки
+                await asyncio.to_thread(self._touch_document, normalized_url)
+                self._mark_visited(normalized_url)
+                logger.info("Документ не изменился (304), обновлена дата: %s", normalized_url)
+                return saved
             
-            html = response.text
+            html, raw_bytes, encoding, response_validators = page
             
             if not html or len(html) < 100:
-                print(f"Предупреждение: получен пустой или очень короткий HTML для {normalized_url}")
+                logger.warning("Предупреждение: получен пустой или очень короткий HTML для %s", normalized_url)
+            
+            # Хеш и ссылки вычисляются вне цикла событий
+            parsed = await self._parse_page(
+                raw_bytes, encoding, normalized_url, with_links=depth < max_depth
+            )
+            if parsed is None:
+                logger.error("Не удалось разобрать страницу (процесс разбора завершился аварийно): %s",
+                             normalized_url)
+                self.failed_count += 1
+                self._mark_visited(normalized_url)
+                return saved
+            content_hash, links, fingerprint = parsed
             
             # Сохраняем документ
-            if self._save_document(normalized_url, html, source_name):
-                self.visited_urls.add(normalized_url)
-                print(f"✓ Успешно сохранен: {normalized_url} ({len(html)} байт)")
+            if fingerprint is not None and self.simhash_index.find_near(fingerprint, normalized_url):
+                # Почти такая же страница уже сохранена: запись пропускаем,
+                # но ссылки со страницы обрабатываем как обычно
+                self._mark_visited(normalized_url)
+                logger.info("≈ Почти дубликат сохраненной страницы, пропущен: %s", normalized_url)
+            elif await self._save_document(normalized_url, html, content_hash, source_name,
+                                           response_validators):
+                if fingerprint is not None:
+                    self.simhash_index.add(fingerprint, normalized_url)
+                self._mark_visited(normalized_url)
+                saved = True
+                logger.info("✓ Успешно сохранен: %s (%s байт)", normalized_url, len(html))
             else:
-                print(f"✗ Не удалось сохранить: {normalized_url}")
+                logger.warning("✗ Не удалось сохранить: %s", normalized_url)
             
             # Извлекаем ссылки для дальнейшей обкачки
             if depth < max_depth:
-                links = self._extract_links(html, normalized_url)
                 base_domain = URLCrawler.get_domain(normalized_url)
                 new_links_count = 0
                 
+                candidates = []
                 for link in links:
                     # Добавляем только ссылки с того же домена
-                    if self._is_same_domain(link, normalized_url):
+                    if URLCrawler.get_domain(link) == base_domain:
                         # Проверяем, не запрещен ли путь для Википедии
-                        if self._is_wikipedia_disallowed_path(link):
+                        if is_wikipedia_disallowed_path(link, base_domain):
                             continue  # Пропускаем запрещенные пути
-                        
-                        if link not in self.visited_urls or self._should_recheck(link):
-                            self.url_queue.append({
-                                "url": link,
-                                "source_name": source_name,
-                                "depth": depth + 1
-                            })
-                            new_links_count += 1
+                        candidates.append(link)
+                
+                # Уже обработанные ссылки проверяем на переобкачку одним запросом
+                candidates = [link for link in candidates
+                              if link not in self.recent_visited and link not in self.url_queue]
+                known = {link for link in candidates if self._maybe_visited(link)}
+                recheck = set()
+                if known:
+                    recheck = set(await asyncio.to_thread(self._filter_recheck_needed, list(known)))
+                
+                for link in candidates:
+                    if link in known and link not in recheck:
+                        continue
+                    if self.url_queue.append({
+                        "url": link,
+                        "source_name": source_name,
+                        "depth": depth + 1
+                    }):
+                        new_links_count += 1
                 
                 if new_links_count > 0:
-                    print(f"  → Найдено {new_links_count} новых ссылок для обкачки")
+                    logger.info("  → Найдено %s новых ссылок для обкачки", new_links_count)
         except Exception as e:
-            print(f"Ошибка при обкачке страницы {url}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Ошибка при обкачке страницы %s: %s", url, e)
             # Продолжаем работу даже при ошибке
+        finally:
+            if claimed_url is not None:
+                self._in_progress.discard(claimed_url)
+        
+        return saved
     
     def _extract_urls_from_saved_docs(self, source_name: str = None, max_depth: int = None):
         """
         Извлекает ссылки из уже сохраненных документов для продолжения обкачки.
         
+        Документы читаются курсором пакетами и разбираются пакетами по 100
+        в пуле процессов (если он создан); в очередь ссылки добавляются здесь.
+        
         Args:
             source_name: Имя источника для фильтрации (None = все источники)
             max_depth: Максимальная глубина для извлечения ссылок
@@ -920,216 +1610,372 @@ class DocumentCrawler:
         if source_name:
             query['source_name'] = source_name
         
-        print("Извлечение ссылок из сохраненных документов...")
+        logger.info("Извлечение ссылок из сохраненных документов...")
         extracted_count = 0
         processed_count = 0
-        queue_urls = {item['url'] for item in self.url_queue}  # Для быстрой проверки дубликатов
+        
+        def enqueue(results: List[Tuple[str, List[str]]], doc_sources: Dict[str, str]):
+            nonlocal extracted_count, processed_count
+            # Ссылки пакета, которых еще нет в очереди, с источником первого документа
+            candidates = {}
+            for url, links in results:
+                for link in links:
+                    if link not in self.url_queue and link not in candidates:
+                        candidates[link] = source_name or doc_sources.get(url, 'Unknown')
+            
+            # Возможно обработанные URL проверяются по базе одним запросом на пакет,
+            # а не по запросу на каждую ссылку
+            known = [link for link in candidates if self._maybe_visited(link)]
+            recheck = set(self._filter_recheck_needed(known)) if known else set()
+            known = set(known)
+            
+            with self._init_lock:
+                for link, link_source in candidates.items():
+                    # Добавляем в очередь, если еще не обработан или нужно переобкачать
+                    if link in known and link not in recheck:
+                        continue
+                    # Ссылки из сохраненных документов имеют глубину >= 1
+                    if self.url_queue.append({
+                        "url": link,
+                        "source_name": link_source,
+                        "depth": 1
+                    }):
+                        extracted_count += 1
+            
+            previous_count = processed_count
+            processed_count += len(results)
+            if processed_count // 100 > previous_count // 100:
+                logger.info("Обработано %s документов, найдено %s новых ссылок...", processed_count, extracted_count)
+        
+        # Пакеты разбираются параллельно; одновременно в работе не больше двух
+        # пакетов на процесс, чтобы не держать в памяти весь корпус
+        in_flight = collections.deque()  # (future, пул, пакет, источники документов)
+        max_in_flight = max(1, self._parse_workers * 2)
+        
+        def submit(batch):
+            # Пул читается и используется под блокировкой: при параллельном
+            # восстановлении источников другой поток не может закрыть его
+            # (_restart_parse_pool) между чтением self._parse_pool и submit
+            with self._init_lock:
+                pool = self._parse_pool
+                try:
+                    return pool, pool.submit(_saved_docs_worker, batch, self.strict_normalize)
+                except BrokenProcessPool:
+                    return pool, None
+        
+        def retry(pool, batch, doc_sources):
+            # Процесс разбора упал: пересоздаем пул и повторяем пакет один раз,
+            # дожидаясь результата, чтобы повтор не упал вместе с другими пакетами.
+            # В основном процессе пакет не разбираем - он может уронить и его
+            self._restart_parse_pool(pool)
+            pool, future = submit(batch)
+            try:
+                results = future.result() if future is not None else None
+            except BrokenProcessPool:
+                results = None
+            if results is None:
+                self._restart_parse_pool(pool)
+                logger.error("Не удалось разобрать %s сохраненных документов, начиная с %s "
+                             "(процесс разбора завершился аварийно)", len(batch), batch[0][0])
+                return
+            enqueue(results, doc_sources)
+        
+        def dispatch(batch, doc_sources):
+            if self._parse_pool is None:
+                enqueue(_saved_docs_worker(batch, self.strict_normalize), doc_sources)
+                return
+            pool, future = submit(batch)
+            if future is None:
+                retry(pool, batch, doc_sources)
+                return
+            in_flight.append((future, pool, batch, doc_sources))
+        
+        def collect():
+            future, pool, batch, doc_sources = in_flight.popleft()
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                retry(pool, batch, doc_sources)
+                return
+            enqueue(results, doc_sources)
         
         try:
-            cursor = self.db_collection.find(query, {"url": 1, "html_content": 1})
-            total_docs = self.db_collection.count_documents(query)
+            # Без count_documents: подсчет требует полного прохода по коллекции
+            cursor = self.db_collection.find(
+                query,
+                {"url": 1, "html_content": 1, "compression": 1, "source_name": 1, "_id": 0},
+                batch_size=500
+            )
             
+            batch, doc_sources = [], {}
             for doc in cursor:
+                if self._restore_cancelled.is_set():
+                    # Обкачка остановлена: недоразобранные пакеты не ждем
+                    cursor.close()
+                    for future, *_ in in_flight:
+                        future.cancel()
+                    return
                 url = doc.get('url')
-                html = doc.get('html_content', '')
-                
-                if not html:
+                if not url or not doc.get('html_content'):
                     continue
-                
-                processed_count += 1
-                if processed_count % 100 == 0:
-                    print(f"Обработано {processed_count}/{total_docs} документов, найдено {extracted_count} новых ссылок...")
-                
-                try:
-                    links = self._extract_links(html, url)
-                    base_domain = URLCrawler.get_domain(url)
-                    
-                    for link in links:
-                        # Добавляем только ссылки с того же домена
-                        if self._is_same_domain(link, url):
-                            normalized_link = URLCrawler.normalize_url(link)
-                            
-                            # Проверяем, не запрещен ли путь для Википедии
-                            if self._is_wikipedia_disallowed_path(normalized_link):
-                                continue  # Пропускаем запрещенные пути
-                            
-                            # Добавляем в очередь, если еще не обработан или нужно переобкачать
-                            if (normalized_link not in self.visited_urls or self._should_recheck(normalized_link)) and \
-                               normalized_link not in queue_urls:
-                                # Определяем глубину на основе источника
-                                depth = 1  # Ссылки из сохраненных документов имеют глубину >= 1
-                                self.url_queue.append({
-                                    "url": normalized_link,
-                                    "source_name": source_name or doc.get('source_name', 'Unknown'),
-                                    "depth": depth
-                                })
-                                queue_urls.add(normalized_link)  # Добавляем в множество для быстрой проверки
-                                extracted_count += 1
-                except Exception as e:
-                    print(f"Ошибка при извлечении ссылок из {url}: {e}")
+                batch.append((url, doc['html_content'], doc.get('compression')))
+                doc_sources[url] = doc.get('source_name', 'Unknown')
+                if len(batch) >= 100:
+                    dispatch(batch, doc_sources)
+                    batch, doc_sources = [], {}
+                    while len(in_flight) >= max_in_flight:
+                        collect()
             
-            print(f"Обработано {processed_count} документов")
+            if batch:
+                dispatch(batch, doc_sources)
+            while in_flight:
+                collect()
+            
+            logger.info("Обработано %s документов", processed_count)
             if extracted_count > 0:
-                print(f"Извлечено {extracted_count} новых ссылок из сохраненных документов")
+                logger.info("Извлечено %s новых ссылок из сохраненных документов", extracted_count)
             else:
-                print("Новых ссылок не найдено в сохраненных документах")
+                logger.info("Новых ссылок не найдено в сохраненных документах")
         except Exception as e:
-            print(f"Ошибка при извлечении ссылок из сохраненных документов: {e}")
+            logger.error("Ошибка при извлечении ссылок из сохраненных документов: %s", e)
     
     def _initialize_queue(self):
         """Инициализирует очередь URL из конфигурации и сохраненных документов."""
         sources = self.config['logic'].get('sources', [])
         
         # Добавляем начальные URL из конфигурации
-        for source in sources:
-            if source.get('enabled', True):
-                url = source['url']
-                name = source.get('name', 'Unknown')
-                normalized = URLCrawler.normalize_url(url)
-                if normalized not in self.visited_urls or self._should_recheck(normalized):
-                    self.url_queue.append({
-                        "url": normalized,
-                        "source_name": name,
-                        "depth": 0
-                    })
+        seeds = [
+            (URLCrawler.normalize_url(source['url'], strict=self.strict_normalize),
+             source.get('name', 'Unknown'))
+            for source in sources if source.get('enabled', True)
+        ]
+        # Уже обработанные начальные URL проверяются по базе одним запросом
+        recheck = set(self._filter_recheck_needed(
+            [url for url, _ in seeds if self._maybe_visited(url)]))
+        for normalized, name in seeds:
+            if not self._maybe_visited(normalized) or normalized in recheck:
+                self.url_queue.append({
+                    "url": normalized,
+                    "source_name": name,
+                    "depth": 0
+                })
         
         # Извлекаем ссылки из уже сохраненных документов для продолжения обкачки
         # Это позволяет продолжить работу после остановки
         restore_queue = self.config['logic'].get('restore_queue_from_saved', True)
-        if restore_queue and len(self.visited_urls) > 0:
-            print("\nПопытка восстановить очередь из сохраненных документов...")
-            print("(Это может занять некоторое время при большом количестве документов)")
-            for source in sources:
-                if source.get('enabled', True):
-                    source_name = source.get('name', 'Unknown')
+        if restore_queue and self.known_urls_count > 0:
+            logger.info("Попытка восстановить очередь из сохраненных документов...")
+            logger.info("(Это может занять некоторое время при большом количестве документов)")
+            source_names = [source.get('name', 'Unknown') for source in sources
+                            if source.get('enabled', True)]
+            if len(source_names) > 1:
+                # Источники читаются из базы параллельно: драйвер MongoDB отпускает
+                # GIL на время сетевого обмена, а разбор идет в пуле процессов
+                executor = ThreadPoolExecutor(max_workers=len(source_names))
+                try:
+                    list(executor.map(self._extract_urls_from_saved_docs, source_names))
+                except KeyboardInterrupt:
+                    # Не ждем, пока потоки дочитают курсоры: они проверяют флаг
+                    # на каждом документе и завершаются сами
+                    self._restore_cancelled.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                executor.shutdown()
+            else:
+                for source_name in source_names:
                     self._extract_urls_from_saved_docs(source_name=source_name)
     
-    def run(self):
-        """Запускает процесс обкачки."""
-        print("=" * 60)
-        print("Запуск поискового робота...")
-        print("=" * 60)
-        
-        # Инициализируем заголовки для сессии
-        self.session.headers.update(self._get_headers())
-        
-        # Подключаемся к базе данных
-        self._connect_db()
-        
-        # Загружаем уже обработанные URL
-        self._load_visited_urls()
-        
-        # Инициализируем очередь
-        self._initialize_queue()
+    async def _crawl_task(self, item: Dict):
+        """Обкачивает URL из очереди и обновляет статистику."""
+        url = item.get("url")
+        try:
+            if await self._crawl_page(url, item["source_name"], item["depth"]):
+                self.pages_saved += 1
+        except Exception as e:
+            logger.exception("Критическая ошибка при обкачке %s: %s", url, e)
+            # Продолжаем работу
+        finally:
+            self.pages_crawled += 1
+            # Домен снова доступен после crawl-delay от последнего запроса к нему
+            domain = URLCrawler.get_domain(url)
+            self.url_queue.release(domain, self._domain_next_ok_at.get(domain, 0.0))
+            self._fetch_semaphore.release()
+        
+        # Периодически выводим статистику
+        current_time = time.time()
+        if current_time - self._last_stats_time >= 30:  # Каждые 30 секунд
+            elapsed = current_time - self._start_time
+            rate = self.pages_crawled / elapsed if elapsed > 0 else 0
+            logger.info("[Статистика] Обработано: %s, Сохранено: %s, В очереди: %s, "
+                        "Неудачных: %s, Скорость: %.2f стр/сек",
+                        self.pages_crawled, self.pages_saved, len(self.url_queue),
+                        self.failed_count, rate)
+            self._last_stats_time = current_time
+    
+    async def _crawl_loop(self, max_pages: int, concurrency: int):
+        """
+        Раздает URL из очереди параллельным задачам обкачки.
         
-        default_delay = self.config['logic'].get('delay_between_requests', 5.0)
-        max_pages = self.config['logic'].get('max_pages', 0)
-        pages_crawled = 0
-        pages_saved = 0
-        start_time = time.time()
-        last_stats_time = start_time
-        
-        print(f"\nСтатистика:")
-        print(f"  - Уже обработано URL: {len(self.visited_urls)}")
-        print(f"  - URL в очереди: {len(self.url_queue)}")
-        print(f"  - Задержка по умолчанию: {default_delay} сек")
-        print(f"  - Задержки из robots.txt будут применяться автоматически")
-        print(f"  - Максимальная глубина: {self.config['logic'].get('max_depth', 10)}")
-        if max_pages > 0:
-            print(f"  - Лимит страниц: {max_pages}")
-        print("\nНачинаем обкачку...\n")
+        Глобальный семафор ограничивает число одновременных загрузок.
+        Очередь выдает URL только тех доменов, для которых истек crawl-delay
+        и нет незавершенной загрузки, поэтому задачи не простаивают в ожидании
+        вежливой паузы, а разные домены обкачиваются параллельно.
         
-        try:
-            while self.url_queue:
-                # Проверяем лимит страниц
-                if max_pages > 0 and pages_crawled >= max_pages:
-                    print(f"\nДостигнут лимит страниц: {max_pages}")
-                    break
-                
-                # Берем следующий URL из очереди
-                try:
-                    item = self.url_queue.pop(0)
-                    url = item["url"]
-                    source_name = item["source_name"]
-                    depth = item["depth"]
-                except (IndexError, KeyError) as e:
-                    print(f"Ошибка при получении URL из очереди: {e}")
-                    break
-                
-                # Обкачиваем страницу
-                try:
-                    before_save_count = len(self.visited_urls)
-                    self._crawl_page(url, source_name, depth)
-                    pages_crawled += 1
+        Args:
+            max_pages: Лимит страниц (0 - без лимита)
+            concurrency: Максимальное число одновременных загрузок
+        """
+        self._fetch_semaphore = asyncio.Semaphore(concurrency)
+        self._parse_retry_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        dispatched = 0
+        
+        # Пул keep-alive соединений с кэшем DNS: TCP/TLS рукопожатия не повторяются.
+        # Каждая задача держит не больше одного запроса (robots.txt или страница),
+        # поэтому по умолчанию соединений столько же, сколько одновременных загрузок
+        pool_size = self.config['logic'].get('connection_pool_size') or concurrency
+        connector = aiohttp.TCPConnector(limit=pool_size, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                         fallback_charset_resolver=_resolve_charset) as session:
+            self.session = session
+            try:
+                while self.url_queue or tasks:
+                    # Проверяем лимит страниц
+                    if max_pages > 0 and dispatched >= max_pages:
+                        break
                     
-                    # Проверяем, был ли документ сохранен
-                    if len(self.visited_urls) > before_save_count:
-                        pages_saved += 1
+                    await self._fetch_semaphore.acquire()
                     
-                    # Периодически выводим статистику
-                    current_time = time.time()
-                    if current_time - last_stats_time >= 30:  # Каждые 30 секунд
-                        elapsed = current_time - start_time
-                        rate = pages_crawled / elapsed if elapsed > 0 else 0
-                        print(f"\n[Статистика] Обработано: {pages_crawled}, Сохранено: {pages_saved}, "
-                              f"В очереди: {len(self.url_queue)}, "
-                              f"Неудачных: {len(self.failed_urls)}, "
-                              f"Скорость: {rate:.2f} стр/сек\n")
-                        last_stats_time = current_time
+                    # Берем URL первого домена, к которому уже можно обращаться
+                    item = self.url_queue.pop_ready(loop.time())
+                    if item is None:
+                        self._fetch_semaphore.release()
+                        # Ждем, пока освободится ближайший домен или задачи
+                        # добавят новые ссылки
+                        ready_at = self.url_queue.next_ready_time()
+                        timeout = None if ready_at is None else max(0.0, ready_at - loop.time())
+                        if tasks:
+                            await asyncio.wait(set(tasks), timeout=timeout,
+                                               return_when=asyncio.FIRST_COMPLETED)
+                        elif timeout is not None:
+                            await asyncio.sleep(timeout)
+                        else:
+                            break
+                        continue
                     
-                except Exception as e:
-                    print(f"Критическая ошибка при обкачке {url}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    # Продолжаем работу
-                    pages_crawled += 1
+                    task = asyncio.create_task(self._crawl_task(item))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    dispatched += 1
                 
-                # Задержка между запросами (используем crawl-delay из robots.txt, если доступен)
-                # Гарантируем минимум 5 секунд для предотвращения блокировок
-                if self.url_queue:  # Не ждем после последнего запроса
-                    # Получаем задержку для текущего домена из robots.txt
-                    domain_delay = self._get_crawl_delay(url)
-                    MIN_DELAY = 5.0  # Минимальная задержка в секундах
-                    actual_delay = max(domain_delay, MIN_DELAY)
-                    if actual_delay > 0:
-                        time.sleep(actual_delay)
+                if tasks:
+                    await asyncio.gather(*tasks)
+            finally:
+                self.session = None
+    
+    def run(self):
+        """Запускает процесс обкачки."""
+        logger.info("=" * 60)
+        logger.info("Запуск поискового робота...")
+        logger.info("=" * 60)
+        
+        self.pages_crawled = 0
+        self.pages_saved = 0
+        start_time = time.time()
+        self._start_time = start_time
+        self._last_stats_time = start_time
+        
+        # Подготовка тоже внутри try: при ошибке (или sys.exit в _connect_db)
+        # finally закроет пул, базу и поток логирования
+        try:
+            # Подключаемся к базе данных
+            self._connect_db()
+            
+            # Загружаем уже обработанные URL
+            self._load_visited_urls()
+            
+            # Открываем кэш robots.txt
+            robots_ttl = self.config['logic'].get('robots_ttl_hours', 24) * 60 * 60
+            robots_cache_path = self.config['logic'].get('robots_cache_path', 'robots_cache.sqlite')
+            try:
+                self.robots_cache = RobotsCache(robots_cache_path, robots_ttl)
+            except sqlite3.Error as e:
+                logger.warning("Предупреждение: не удалось открыть кэш robots.txt '%s': %s", robots_cache_path, e)
+            
+            # Пул процессов для разбора HTML (0 - разбор в основном процессе)
+            parse_workers = self.config['logic'].get('parse_workers', os.cpu_count() or 1)
+            if parse_workers > 0:
+                self._parse_workers = parse_workers
+                self._parse_pool = self._new_parse_pool()
+            
+            # Инициализируем очередь
+            self._initialize_queue()
+            
+            default_delay = self.config['logic'].get('delay_between_requests', 5.0)
+            max_pages = self.config['logic'].get('max_pages', 0)
+            concurrency = max(1, self.config['logic'].get('max_concurrency', 10))
+            
+            logger.info("Статистика:")
+            logger.info("  - Уже обработано URL: %s", self.known_urls_count)
+            logger.info("  - URL в очереди: %s", len(self.url_queue))
+            logger.info("  - Задержка по умолчанию: %s сек", default_delay)
+            logger.info("  - Задержки из robots.txt будут применяться автоматически")
+            logger.info("  - Параллельных загрузок: %s", concurrency)
+            logger.info("  - Процессов разбора HTML: %s", parse_workers)
+            logger.info("  - Максимальная глубина: %s", self.config['logic'].get('max_depth', 10))
+            if max_pages > 0:
+                logger.info("  - Лимит страниц: %s", max_pages)
+            logger.info("Начинаем обкачку...")
+            
+            # Время работы и скорость считаются без подготовки очереди
+            start_time = time.time()
+            self._start_time = start_time
+            self._last_stats_time = start_time
+            asyncio.run(self._crawl_loop(max_pages, concurrency))
+            
+            if max_pages > 0 and self.pages_crawled >= max_pages:
+                logger.info("Достигнут лимит страниц: %s", max_pages)
             
             # Финальная статистика
             elapsed_time = time.time() - start_time
-            print("\n" + "=" * 60)
-            print("Обкачка завершена!")
-            print("=" * 60)
-            print(f"Обработано страниц: {pages_crawled}")
-            print(f"Сохранено документов: {pages_saved}")
-            print(f"Неудачных загрузок: {len(self.failed_urls)}")
-            print(f"Осталось в очереди: {len(self.url_queue)}")
-            print(f"Время работы: {elapsed_time:.2f} сек ({elapsed_time/60:.2f} мин)")
-            if pages_crawled > 0:
-                print(f"Средняя скорость: {pages_crawled/elapsed_time:.2f} стр/сек")
+            logger.info("=" * 60)
+            logger.info("Обкачка завершена!")
+            logger.info("=" * 60)
+            logger.info("Обработано страниц: %s", self.pages_crawled)
+            logger.info("Сохранено документов: %s", self.pages_saved)
+            logger.info("Неудачных загрузок: %s", self.failed_count)
+            logger.info("Осталось в очереди: %s", len(self.url_queue))
+            logger.info("Время работы: %.2f сек (%.2f мин)", elapsed_time, elapsed_time/60)
+            if self.pages_crawled > 0:
+                logger.info("Средняя скорость: %.2f стр/сек", self.pages_crawled/elapsed_time)
         
         except KeyboardInterrupt:
             elapsed_time = time.time() - start_time
-            print("\n\n" + "=" * 60)
-            print("Получен сигнал остановки. Робот остановлен.")
-            print("=" * 60)
-            print(f"Обработано страниц: {pages_crawled}")
-            print(f"Сохранено документов: {pages_saved}")
-            print(f"Неудачных загрузок: {len(self.failed_urls)}")
-            print(f"Осталось в очереди: {len(self.url_queue)}")
-            print(f"Время работы: {elapsed_time:.2f} сек")
-            print("\nПри следующем запуске робот продолжит с оставшихся URL")
+            logger.info("=" * 60)
+            logger.info("Получен сигнал остановки. Робот остановлен.")
+            logger.info("=" * 60)
+            logger.info("Обработано страниц: %s", self.pages_crawled)
+            logger.info("Сохранено документов: %s", self.pages_saved)
+            logger.info("Неудачных загрузок: %s", self.failed_count)
+            logger.info("Осталось в очереди: %s", len(self.url_queue))
+            logger.info("Время работы: %.2f сек", elapsed_time)
+            logger.info("При следующем запуске робот продолжит с оставшихся URL")
         
         except Exception as e:
-            print(f"\nКритическая ошибка: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.critical("Критическая ошибка: %s", e, exc_info=True)
         
         finally:
-            if self.session:
-                self.session.close()
+            if self.db_collection is not None:
+                self._flush_documents()
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown(cancel_futures=True)
+            if self.robots_cache:
+                self.robots_cache.close()
             if self.db_client:
                 self.db_client.close()
-                print("\nСоединение с базой данных закрыто")
+                logger.info("Соединение с базой данных закрыто")
+            self._log_listener.stop()
 
 
 def main():
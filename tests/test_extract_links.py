@@ -0,0 +1,37 @@
+"""Тесты извлечения ссылок из HTML (crawler.extract_links)."""
+
+import os
+import sys
+
+import pytest
+
+for module in ('aiohttp', 'lxml', 'pymongo', 'yaml'):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawler  # noqa: E402
+
+
+EXTRACTORS = [crawler._extract_links_lxml]
+if crawler.SelectolaxParser is not None:
+    EXTRACTORS.append(crawler._extract_links_selectolax)
+
+
+@pytest.mark.parametrize('extract', EXTRACTORS)
+def test_bad_href_with_base_href_keeps_other_links(extract):
+    html = (
+        '<html><head><base href="http://example.com/dir/"></head><body>'
+        '<a href="page">a</a>'
+        '<a href="http://[bad/x">b</a>'
+        '<a href="/other">c</a>'
+        '</body></html>'
+    )
+    links = extract(html, 'http://example.com/', False)
+    assert links == ['http://example.com/dir/page', 'http://example.com/other']
+
+
+@pytest.mark.parametrize('extract', EXTRACTORS)
+def test_whitespace_only_html_has_no_links(extract, caplog):
+    assert extract('  \n\t ', 'http://example.com/', False) == []
+    assert not [record for record in caplog.records if record.levelno >= 40]
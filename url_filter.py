@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нормализация и фильтрация URL для поискового робота.
+
+Классификация ссылок вынесена из crawler.py в отдельный модуль без
+зависимостей от сети и базы (сторонние библиотеки необязательны), чтобы ее
+можно было использовать в процессах разбора HTML и проверять отдельно.
+"""
+
+import functools
+import re
+import urllib.parse
+from typing import Optional, Tuple
+
+# Поиск множества подстрок за один проход (без него - регулярное выражение)
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Расширения файлов (изображения, документы, архивы, медиа, веб-файлы, шрифты),
+# которые исключаются из обкачки
+_FILE_EXT_RE = re.compile(
+    r'\.(?:png|jpg|jpeg|gif|svg|webp|ico'
+    r'|pdf|doc|docx|xls|xlsx|ppt|pptx'
+    r'|zip|rar|7z|tar|gz'
+    r'|mp3|mp4|avi|mov|wmv|flv'
+    r'|css|js|json|xml'
+    r'|ttf|woff2?|eot)(?:$|[?#])',
+    re.IGNORECASE
+)
+
+# Страницы файлов и медиа в Википедии
+_WIKI_FILE_RE = re.compile(r'/(?:wiki/)?(?:File|Файл|Media|Медиа):', re.IGNORECASE)
+
+
+# Общие запрещенные пути Википедии для всех языковых версий
+_WIKI_DISALLOW_RE = re.compile('|'.join(map(re.escape, (
+    '/w/',  # Но Allow: /w/api.php?action=mobileview&, /w/load.php?, /w/rest.php/site/v1/sitemap
+    '/api/',  # Но Allow: /api/rest_v1/?doc
+    '/trap/',
+    '/wiki/Special:',
+    '/wiki/Spezial:',
+    '/wiki/Spesial:',
+    '/wiki/Special%3A',
+    '/wiki/Spezial%3A',
+    '/wiki/Spesial%3A',
+))))
+
+# Разрешенные исключения для /w/
+_WIKI_W_ALLOW_RE = re.compile('|'.join(map(re.escape, (
+    '/w/api.php?action=mobileview&',
+    '/w/load.php?',
+    '/w/rest.php/site/v1/sitemap',
+))))
+
+
+# Служебные страницы и категории Википедии, которые не считаются статьями
+_WIKI_FORBIDDEN_PREFIXES = (
+    '/wiki/Википедия:',
+    '/wiki/Wikipedia:',
+    '/wiki/Участник:',
+    '/wiki/Участница:',
+    '/wiki/Обсуждение_участника:',
+    '/wiki/Обсуждение_участницы:',
+    '/wiki/Special:',
+    '/wiki/User:',
+    '/wiki/User_talk:',
+    '/wiki/File:',
+    '/wiki/Файл:',
+    '/wiki/Media:',
+    '/wiki/Медиа:',
+    '/wiki/Category:',
+    '/wiki/Категория:',
+    '/wiki/Category%3A',
+    '/wiki/Категория%3A',
+    '/wiki/%D0%9A%D0%B0%D1%82%D0%B5%D0%B3%D0%BE%D1%80%D0%B8%D1%8F:',
+    '/wiki/%D0%9A%D0%B0%D1%82%D0%B5%D0%B3%D0%BE%D1%80%D0%B8%D1%8F%3A',
+)
+_WIKI_FORBIDDEN_RE = re.compile('|'.join(map(re.escape, _WIKI_FORBIDDEN_PREFIXES)))
+
+# Специфичные запрещенные пути для ru.wikipedia.org
+_RU_DISALLOWED_PATTERNS = (
+    '/wiki/Участник:',
+    '/wiki/Участник%3A',
+    '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA:',
+    '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%3A',
+    '/wiki/Участница:',
+    '/wiki/Участница%3A',
+    '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D0%B0:',
+    '/wiki/%D0%A3%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D0%B0%3A',
+    '/wiki/Обсуждение_участника:',
+    '/wiki/Обсуждение_участника%3A',
+    '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%D0%B0:',
+    '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D0%BA%D0%B0%3A',
+    '/wiki/Обсуждение_участницы:',
+    '/wiki/Обсуждение_участницы%3A',
+    '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D1%8B:',
+    '/wiki/%D0%9E%D0%B1%D1%81%D1%83%D0%B6%D0%B4%D0%B5%D0%BD%D0%B8%D0%B5_%D1%83%D1%87%D0%B0%D1%81%D1%82%D0%BD%D0%B8%D1%86%D1%8B%3A',
+    '/wiki/Википедия:Выборы_арбитров/',
+    '/wiki/Википедия%3AВыборы_арбитров%2F',
+    '/wiki/Википедия:К_удалению',
+    '/wiki/Википедия%3AК_удалению',
+    '/wiki/Википедия:К_восстановлению',
+    '/wiki/Википедия%3AК_восстановлению',
+    '/wiki/Википедия:Архив_запросов_на_удаление/',
+    '/wiki/Википедия%3AАрхив_запросов_на_удаление%2F',
+    '/wiki/Википедия:Проверка_участников',
+    '/wiki/Википедия%3AПроверка_участников',
+    '/wiki/Википедия:Запросы_к_администраторам',
+    '/wiki/Википедия%3AЗапросы_к_администраторам',
+    '/wiki/Википедия:Заявки_на_снятие_флагов',
+    '/wiki/Википедия%3AЗаявки_на_снятие_флагов',
+    '/wiki/Википедия:Запросы,_связанные_с_VRTS',
+    '/wiki/Википедия%3AЗапросы%2C_связанные_с_VRTS',
+    # Также проверяем варианты с URL-кодированием
+    '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BF%D0%B5%D0%B4%D0%B8%D1%8F:',
+    '/wiki/Википедия:Сообщить_об_ошибке',
+    '/wiki/Википедия:Как_править_статьи',
+    '/wiki/Википедия:Сообщество',
+    '/wiki/Википедия:Форум',
+    '/wiki/Википедия:Справка',
+    '/wiki/Служебная:RecentChanges',  # Свежие правки
+    '/wiki/Специальная:NewPages',  # Новые страницы
+    '/wiki/Служебная:SpecialPages',  # Служебные страницы
+    '/wiki/Служебная:WhatLinksHere',  # Ссылки сюда
+    '/wiki/Служебная:RecentChangesLinked',  # Связанные правки
+    '/wiki/Служебная:PermanentLink',  # Постоянная ссылка
+    '/wiki/Служебная:Info',  # Сведения о странице
+    '/wiki/Служебная:ShortUrl',  # Получить короткий URL
+    '/wiki/Специальная:QrCode',  # Скачать QR-код
+    '/wiki/Служебная:Print',  # Печать/экспорт
+    '/wiki/Специальная:DownloadAsPdf',  # Скачать как PDF
+    '/wiki/Специальная:PrintableVersion',  # Версия для печати
+    
+    '/wiki/Викиновости:',
+    '/wiki/Викицитатник:',
+    '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D1%86%D0%B8%D1%82%D0%B0%D1%82%D0%BD%D0%B8%D0%BA:',
+    '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BD%D0%BE%D0%B2%D0%BE%D1%81%D1%82%D0%B8:',
+    
+    # Викиданные
+    '/wiki/d:',
+    '/wiki/Q',
+    '/wiki/P',
+    
+    # Другие языки (примеры из списка)
+    '/wiki/%D0%90%D0%B7%C9%99%D1%80%D0%B1%D0%B0%D1%98%D1%81%D0%B0%D0%BD%D0%B4%D0%B6%D0%B0:',
+    '/wiki/%D0%91%D0%B0%D1%88%D2%A1%D0%BE%D1%80%D1%82%D1%81%D0%B0:',
+    '/wiki/%D0%91%D0%B5%D0%BB%D0%B0%D1%80%D1%83%D1%81%D0%BA%D0%B0%D1%8F:',
+    '/wiki/%D0%9D%D0%BE%D1%85%D1%87%D0%B8%D0%B9%D0%BD:',
+    '/wiki/%D0%A7%D3%90%D0%B2%D0%B0%D1%88%D0%BB%D0%B0:',
+    '/wiki/Hawai%CA%BBi:',
+    '/wiki/%D0%93%D0%B0%D0%B9%D0%B5%D1%80%D0%B5%D0%BD:',
+    '/wiki/%D0%9A%D1%8B%D1%80%D0%B3%D1%8B%D0%B7%D1%87%D0%B0:',
+    '/wiki/%D0%98%D1%80%D0%BE%D0%BD:',
+)
+
+# Служебное пространство имен "Википедия:" и разрешенные в нем страницы
+_RU_PROJECT_PREFIX = '/wiki/Википедия:'
+_RU_PROJECT_PREFIX_QUOTED = '/wiki/%D0%92%D0%B8%D0%BA%D0%B8%D0%BF%D0%B5%D0%B4%D0%B8%D1%8F:'
+_RU_ALLOWED_PROJECT_PAGES = (
+    '/wiki/Категория:',
+    '/wiki/Список:',
+)
+
+if ahocorasick is not None:
+    # Автомат Ахо-Корасик: все шаблоны ищутся за один проход по строке
+    _RU_DISALLOWED_AUTOMATON = ahocorasick.Automaton()
+    for _pattern in _RU_DISALLOWED_PATTERNS:
+        _RU_DISALLOWED_AUTOMATON.add_word(_pattern, _pattern)
+    _RU_DISALLOWED_AUTOMATON.make_automaton()
+    del _pattern
+    _RU_DISALLOWED_RE = None
+else:
+    _RU_DISALLOWED_AUTOMATON = None
+    # Без pyahocorasick - одно регулярное выражение вместо перебора шаблонов
+    _RU_DISALLOWED_RE = re.compile('|'.join(map(re.escape, _RU_DISALLOWED_PATTERNS)))
+
+
+def _ru_disallowed_match(text: str) -> bool:
+    """Проверяет, содержит ли строка один из шаблонов _RU_DISALLOWED_PATTERNS."""
+    if _RU_DISALLOWED_AUTOMATON is not None:
+        return next(_RU_DISALLOWED_AUTOMATON.iter(text), None) is not None
+    return _RU_DISALLOWED_RE.search(text) is not None
+
+
+# Повторяющиеся слеши в пути URL
+_MULTI_SLASH_RE = re.compile(r'/{2,}')
+
+
+@functools.lru_cache(maxsize=65536)
+def cached_split(url: str) -> urllib.parse.SplitResult:
+    """
+    Разбирает URL через urlsplit и кэширует результат.
+    
+    Один и тот же URL проверяется и нормализуется несколькими функциями,
+    а разбирается при этом только один раз.
+    """
+    return urllib.parse.urlsplit(url)
+
+
+@functools.lru_cache(maxsize=200_000)
+def get_domain(url: str) -> str:
+    """Извлекает домен из URL (с кэшированием)."""
+    try:
+        return cached_split(url).netloc.lower()
+    except:
+        return ""
+
+
+def is_file_url(url: str) -> bool:
+    """
+    Проверяет, является ли URL файлом (изображением, медиа и т.д.).
+    
+    Args:
+        url: URL для проверки
+        
+    Returns:
+        True, если это файл
+    """
+    return bool(_FILE_EXT_RE.search(url) or _WIKI_FILE_RE.search(url))
+
+
+def is_wikipedia_article_url(url: str, domain: str) -> bool:
+    """
+    Проверяет, является ли URL обычной статьей Википедии (не служебной страницей, не категорией, не файлом).
+    Согласно robots.txt Википедии, обычные статьи разрешены для обкачки.
+    
+    Args:
+        url: URL для проверки
+        domain: Домен URL (в нижнем регистре)
+        
+    Returns:
+        True, если это обычная статья
+    """
+    if 'wikipedia.org' not in domain:
+        return False
+    
+    # Проверяем, что это не файл
+    if is_file_url(url):
+        return False
+    
+    # Проверяем, что это не запрещенный путь
+    if is_wikipedia_disallowed_path(url, domain):
+        return False
+    
+    # Разрешаем только обычные статьи (начинаются с /wiki/)
+    if '/wiki/' not in url:
+        return False
+    
+    # Исключаем служебные страницы и категории; URL декодируется,
+    # только если исходная строка не совпала и в ней есть %-кодирование
+    if _WIKI_FORBIDDEN_RE.search(url):
+        return False
+    if '%' in url and _WIKI_FORBIDDEN_RE.search(urllib.parse.unquote(url)):
+        return False
+    
+    return True
+
+
+@functools.lru_cache(maxsize=65536)
+def is_wikipedia_disallowed_path(url: str, domain: str) -> bool:
+    """
+    Проверяет, попадает ли URL под запрещенные пути для Википедии согласно robots.txt.
+    Это дополнительная проверка для русской Википедии.
+    
+    Результат кэшируется: одни и те же служебные ссылки встречаются почти
+    на каждой странице Википедии.
+    
+    Args:
+        url: URL для проверки
+        domain: Домен URL (в нижнем регистре)
+        
+    Returns:
+        True, если путь запрещен
+    """
+    if 'wikipedia.org' not in domain:
+        return False
+    
+    # Декодируем URL для проверки
+    decoded_url = url
+    if '%' in url:
+        try:
+            decoded_url = urllib.parse.unquote(url)
+        except:
+            pass
+    
+    # Проверяем общие запрещенные пути (с исключениями из Allow)
+    texts = (url,) if decoded_url == url else (url, decoded_url)
+    for text in texts:
+        for match in _WIKI_DISALLOW_RE.finditer(text):
+            pattern = match.group()
+            if pattern == '/w/' and _WIKI_W_ALLOW_RE.search(url):
+                continue  # Разрешено
+            if pattern == '/api/' and '/api/rest_v1/?doc' in url:
+                continue  # Разрешено
+            return True
+    
+    # Специфичные запрещенные пути для ru.wikipedia.org
+    if 'ru.wikipedia.org' in domain:
+        if _ru_disallowed_match(url) or (decoded_url != url and _ru_disallowed_match(decoded_url)):
+            return True
+        
+        # Проверяем служебные страницы Википедии (начинающиеся с "Википедия:")
+        if _RU_PROJECT_PREFIX in decoded_url or _RU_PROJECT_PREFIX_QUOTED in url:
+            # Но разрешаем некоторые страницы категорий и списков
+            for allowed in _RU_ALLOWED_PROJECT_PAGES:
+                if allowed in decoded_url:
+                    return False
+            return True
+    
+    return False
+
+
+class URLCrawler:
+    """Класс для нормализации и обработки URL."""
+    
+    @staticmethod
+    def _normalize_parsed(parsed: urllib.parse.SplitResult, strict: bool = False) -> str:
+        """Собирает нормализованный URL из результата urlsplit."""
+        # Нормализуем путь (убираем лишние слеши)
+        path = urllib.parse.unquote(parsed.path)
+        if '//' in path:
+            path = _MULTI_SLASH_RE.sub('/', path)
+        if path and path != '/' and path.endswith('/'):
+            path = path[:-1]
+        
+        # Сортируем параметры запроса для единообразия
+        if not parsed.query:
+            query = ''
+        elif strict:
+            # Полный разбор и перекодирование параметров
+            query_params = urllib.parse.parse_qs(parsed.query, keep_blank_values=True)
+            sorted_params = sorted(query_params.items())
+            query = urllib.parse.urlencode(sorted_params, doseq=True)
+        else:
+            # Сортируем пары key=value как строки по ключу; порядок значений
+            # повторяющегося ключа сохраняется (сортировка устойчивая)
+            pairs = [pair for pair in parsed.query.split('&') if pair]
+            pairs.sort(key=lambda pair: pair.split('=', 1)[0])
+            query = '&'.join(pairs)
+        
+        # Собираем URL обратно (фрагмент удаляется)
+        return urllib.parse.urlunsplit((
+            parsed.scheme.lower(),
+            parsed.netloc.lower(),
+            path,
+            query,
+            ''
+        ))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=131072)
+    def normalize_url(url: str, base_url: str = None, strict: bool = False) -> str:
+        """
+        Нормализует URL: удаляет фрагменты, сортирует параметры и т.д.
+        
+        Результат кэшируется: одни и те же URL (стартовые, повторно найденные
+        ссылки) нормализуются многократно.
+        
+        Args:
+            url: URL для нормализации
+            base_url: Базовый URL для разрешения относительных ссылок
+            strict: Перекодировать параметры запроса через parse_qs/urlencode
+            
+        Returns:
+            Нормализованный URL
+        """
+        if not url:
+            return ""
+        
+        # Разрешаем относительные URL
+        if base_url:
+            url = urllib.parse.urljoin(base_url, url)
+        
+        return URLCrawler._normalize_parsed(cached_split(url), strict)
+    
+    @staticmethod
+    def classify_link(href: str, base_url: str = None, strict: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Нормализует ссылку и проверяет, годится ли она для обкачки.
+        
+        Объединяет normalize_url, is_valid_url, get_domain и фильтры файлов
+        и служебных страниц Википедии: URL разбирается один раз.
+        
+        Args:
+            href: Ссылка (абсолютная или относительная)
+            base_url: Базовый URL для разрешения относительных ссылок
+            strict: Перекодировать параметры запроса через parse_qs/urlencode
+            
+        Returns:
+            (нормализованный URL, домен) или None, если ссылку нужно пропустить
+        """
+        if not href:
+            return None
+        
+        url = urllib.parse.urljoin(base_url, href) if base_url else href
+        parsed = cached_split(url)
+        domain = parsed.netloc.lower()
+        if not parsed.scheme or not domain:
+            return None
+        
+        normalized = URLCrawler._normalize_parsed(parsed, strict)
+        
+        # Исключаем файлы
+        if is_file_url(normalized):
+            return None
+        
+        # Для Википедии оставляем только обычные статьи (не категории, не служебные страницы)
+        if 'wikipedia.org' in domain and not is_wikipedia_article_url(normalized, domain):
+            return None
+        
+        return normalized, domain
+    
+    @staticmethod
+    def is_valid_url(url: str) -> bool:
+        """Проверяет, является ли URL валидным."""
+        try:
+            parsed = cached_split(url)
+            return bool(parsed.scheme and parsed.netloc)
+        except:
+            return False
+    
+    @staticmethod
+    def get_domain(url: str) -> str:
+        """Извлекает домен из URL."""
+        return get_domain(url)